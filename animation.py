@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+
+import pygame
+
+# ------------------- 预烘焙动画 -------------------
+# 淡出、缩放、光晕这类动画的每一帧只跟进度有关，同一段文字、同一尺寸第一次播放时
+# 把整段帧序列画好缓存起来，之后每帧只按进度取出一张 Surface 做一次 blit，
+# 不再每帧新建 SRCALPHA Surface、设置透明度或 smoothscale。
+# 进度由 TweenScheduler 按真实时间算出，与帧率无关。
+
+DEFAULT_MAX_STRIPS = 64
+
+
+class FrameStrip:
+    """一段预先画好的帧序列，at(进度) 取出对应的一帧。"""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def index(self, progress):
+        return min(len(self.frames) - 1, max(0, int(progress * len(self.frames))))
+
+    def at(self, progress):
+        return self.frames[self.index(progress)]
+
+
+class StripCache:
+    """按键缓存 FrameStrip，超出容量时淘汰最久未用的（与 TextCache 相同）。"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_STRIPS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.bakes = 0
+
+    def get(self, key, bake):
+        strip = self._entries.get(key)
+        if strip is not None:
+            self._entries.move_to_end(key)
+            return strip
+        strip = FrameStrip([_to_display(f) for f in bake()])
+        self.bakes += 1
+        self._entries[key] = strip
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return strip
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _to_display(surf):
+    if pygame.display.get_surface() is None:
+        return surf
+    return surf.convert_alpha()
+
+
+# ---------- 烘焙函数：返回帧列表 ----------
+def bake_fade_zoom(surf, count, scale, alpha):
+    """scale(p)、alpha(p) 给出进度 p（0~1）时的缩放倍数和透明度。"""
+    frames = []
+    w, h = surf.get_size()
+    for i in range(count):
+        p = i / count
+        k = scale(p)
+        frame = pygame.transform.smoothscale(surf, (max(1, int(w * k)), max(1, int(h * k))))
+        frame.set_alpha(int(alpha(p)))
+        frames.append(frame)
+    return frames
+
+
+def bake_zoom(surf, scales):
+    w, h = surf.get_size()
+    return [pygame.transform.smoothscale(surf, (int(w * k), int(h * k))) for k in scales]
+
+
+def bake_circle_fade(size, color, radius, count):
+    """圆形光圈，从不透明线性淡出到透明。"""
+    frames = []
+    for i in range(count):
+        frame = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(frame, (*color, int(255 * (1 - i / count))), (size // 2, size // 2), radius)
+        frames.append(frame)
+    return frames
+
+
+def bake_rect_glow(size, color, alphas, border_radius=5):
+    frames = []
+    for a in alphas:
+        frame = pygame.Surface(size, pygame.SRCALPHA)
+        pygame.draw.rect(frame, (*color, a), frame.get_rect(), border_radius=border_radius)
+        frames.append(frame)
+    return frames
+
+
+# ------------------- 补间调度 -------------------
+class TweenScheduler:
+    """按名字记录正在播放的补间动画；进度只由时钟决定。"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._tweens = {}
+
+    def start(self, name, duration, start=None):
+        self._tweens[name] = (self.clock() if start is None else start, duration)
+
+    def stop(self, name):
+        self._tweens.pop(name, None)
+
+    def progress(self, name):
+        """0~1 之间的进度；没有在播放（或已播完）时返回 None。"""
+        tw = self._tweens.get(name)
+        if tw is None:
+            return None
+        start, duration = tw
+        p = (self.clock() - start) / duration if duration > 0 else 1.0
+        if p >= 1:
+            del self._tweens[name]
+            return None
+        return max(0.0, p)
+
+    def active(self):
+        """还有补间在播放时为真，调用方据此按帧率重画。"""
+        return any(self.progress(name) is not None for name in list(self._tweens))
+
+
+ANIMATIONS = StripCache()
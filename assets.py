@@ -0,0 +1,141 @@
+import logging
+import os
+import struct
+import threading
+import time
+
+import pygame
+
+# ------------------- 后台资源加载 -------------------
+# 背景音乐、Logo 等不影响第一帧的资源放到后台线程里按顺序加载，
+# 每完成一项就发一个 ASSETS_READY 事件，界面收到后重画即可用上新资源。
+
+ASSETS_READY = pygame.event.custom_type()
+
+# ------------------- 图片缓存 -------------------
+# 每个尺寸只缩放一次：缩放结果以原始 RGBA 像素存到磁盘缓存，文件头记下原图的修改时间和大小，
+# 原图没变时下次启动直接读像素，不用再解码大图、再缩放。
+# 交给界面的图都转换成显示器的像素格式（convert_alpha），blit 时不用再逐像素转换格式。
+
+CACHE_MAGIC = b"CCIMG1"
+CACHE_HEADER = struct.Struct("<6sqqii")
+
+
+class Assets:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._images = {}
+        # 统计：decodes 是解码原图的次数，cache_hits 是直接读缓存的次数
+        self.decodes = 0
+        self.cache_hits = 0
+
+    def load_image(self, name, path, sizes):
+        """把 path 缩放成 sizes 里的各个边长，之后用 get(name, size) 取。"""
+        if not os.path.exists(path):
+            return
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        source = None
+        for size in sizes:
+            surf = self._read_cache(name, size, stamp)
+            if surf is None:
+                if source is None:
+                    source = self._to_display(pygame.image.load(path))
+                    self.decodes += 1
+                surf = self._scale(source, size)
+                self._write_cache(name, size, stamp, surf)
+            self._images[(name, size)] = self._to_display(surf)
+
+    def get(self, name, size):
+        """还没加载完或没有这张图时返回 None。"""
+        return self._images.get((name, size))
+
+    def load_logo(self, path, sizes):
+        self.load_image("logo", path, sizes)
+
+    def logo(self, size):
+        return self.get("logo", size)
+
+    @staticmethod
+    def _scale(surf, size):
+        # 只缩放一次，用质量更好的 smoothscale；它不支持 8 位等格式，这时退回 scale
+        try:
+            return pygame.transform.smoothscale(surf, (size, size))
+        except ValueError:
+            return pygame.transform.scale(surf, (size, size))
+
+    @staticmethod
+    def _to_display(surf):
+        # 没有窗口时（例如测试）无法转换，保持原样
+        if pygame.display.get_surface() is None:
+            return surf
+        return surf.convert_alpha()
+
+    def _cache_path(self, name, size):
+        return os.path.join(self.cache_dir, f"{name}-{size}.rgba")
+
+    def _read_cache(self, name, size, stamp):
+        if not self.cache_dir:
+            return None
+        path = self._cache_path(name, size)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, mtime, fsize, w, h = CACHE_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        pixels = data[CACHE_HEADER.size:]
+        if magic != CACHE_MAGIC or (mtime, fsize) != stamp or len(pixels) != w * h * 4:
+            return None
+        self.cache_hits += 1
+        return pygame.image.frombytes(pixels, (w, h), "RGBA")
+
+    def _write_cache(self, name, size, stamp, surf):
+        if not self.cache_dir:
+            return
+        w, h = surf.get_size()
+        path = self._cache_path(name, size)
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(CACHE_HEADER.pack(CACHE_MAGIC, stamp[0], stamp[1], w, h))
+                f.write(pygame.image.tobytes(surf, "RGBA"))
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning(f"Failed to write image cache {path}: {e}")
+
+
+class BackgroundLoader:
+    def __init__(self):
+        self.tasks = []
+        # 每项任务的耗时（毫秒）
+        self.timings = {}
+        self.done = threading.Event()
+        self._thread = None
+
+    def add(self, name, fn):
+        self.tasks.append((name, fn))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="asset-loader", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _run(self):
+        for name, fn in self.tasks:
+            t = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                logging.warning(f"Background load of {name} failed: {e}")
+            self.timings[name] = (time.perf_counter() - t) * 1000
+            if pygame.display.get_init():
+                pygame.event.post(pygame.event.Event(ASSETS_READY, name=name))
+        self.done.set()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+ASSETS = Assets()
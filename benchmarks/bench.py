@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# ------------------- 性能基准 -------------------
+# 覆盖公式生成、求值、一帧绘制和冷启动，结果写成 JSON，
+# 并与保存的基线比较，中位数变慢超过阈值即视为回退。
+
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def measure(fn, number, repeat):
+    """每轮调用 fn number 次，返回每次调用的耗时统计（微秒）。"""
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t) / number * 1e6)
+    samples.sort()
+    return {
+        "median_us": statistics.median(samples),
+        "min_us": samples[0],
+        "max_us": samples[-1],
+        "number": number,
+        "repeat": repeat
+    }
+
+
+def bench_generation(results, settings, scale):
+    from formula_parser import SKELETONS
+    from game_state import generate_integer_formula
+    for name, cfg in settings["difficulty"].items():
+        generate_integer_formula(SKELETONS, cfg)
+        results[f"generate_integer_formula[{name}]"] = measure(
+            lambda: generate_integer_formula(SKELETONS, cfg), 2000 * scale, 7)
+
+
+def bench_evaluation(results, scale):
+    from formula_parser import SKELETONS, PLACEHOLDERS, safe_eval, evaluate_skeleton
+    rng = random.Random(0)
+    exprs = []
+    tuples = []
+    for _ in range(500):
+        sk = rng.choice(SKELETONS)
+        nums = [rng.randint(1, 20) for s in sk if s in PLACEHOLDERS]
+        it = iter(nums)
+        exprs.append("".join(str(next(it)) if s in PLACEHOLDERS else s for s in sk))
+        tuples.append((sk, nums))
+
+    def run(fn, items):
+        def loop():
+            for item in items:
+                fn(item)
+        return loop
+
+    for label, exact in (("safe_eval[float]", False), ("safe_eval[exact]", True)):
+        r = measure(run(lambda e: safe_eval(e, exact), exprs), 10 * scale, 7)
+        results[label] = _per_item(r, len(exprs))
+    r = measure(run(lambda t: evaluate_skeleton(t[0], t[1], exact=True), tuples), 20 * scale, 7)
+    results["evaluate_skeleton[exact]"] = _per_item(r, len(tuples))
+
+
+def _per_item(stats, n):
+    for k in ("median_us", "min_us", "max_us"):
+        stats[k] /= n
+    stats["number"] *= n
+    return stats
+
+
+def isolate_config(calcraze, folder):
+    """
+    把游戏会写的文件（分数库、语言包缓存、Logo 缓存、翻译记忆、设置……）都改到 folder 下，
+    设置和语言包先复制过去；跑基准不在仓库的 config/ 里留下文件。题库只读，仍用仓库里的。
+    """
+    src = os.path.join(ROOT, "config")
+    os.makedirs(folder, exist_ok=True)
+    for name in ("settings.json", "languages.json"):
+        path = os.path.join(src, name)
+        if os.path.exists(path) and not os.path.exists(os.path.join(folder, name)):
+            shutil.copy(path, folder)
+    calcraze.CONFIG_DIR = folder
+    calcraze.SCORES_DB_FILE = os.path.join(folder, "scores.db")
+    calcraze.HIGH_SCORE_FILE = os.path.join(folder, "highscore.dat")
+    calcraze.PUZZLE_BANK_FILE = os.path.join(src, "puzzle_bank.bin")
+    calcraze.FRAME_TRACE_FILE = os.path.join(folder, "frame_trace.json")
+    calcraze.TRANSLATION_MEMORY_FILE = os.path.join(folder, "translation_memory.json")
+    calcraze.LANGUAGES_FILE = calcraze.LANGUAGES.path = os.path.join(folder, "languages.json")
+    calcraze.LANGUAGE_CACHE_FILE = calcraze.LANGUAGES.cache_path = os.path.join(folder, "languages.cache")
+    calcraze.SESSIONS_DIR = os.path.join(folder, "sessions")
+    calcraze.IMAGE_CACHE_DIR = calcraze.ASSETS.cache_dir = os.path.join(folder, "image_cache")
+    calcraze.SETTINGS_STORE.path = os.path.join(folder, "settings.json")
+    calcraze.SCORES = None
+
+
+def bench_game(results, settings, scale, config_dir):
+    import pygame
+    import calcraze
+    from language_pack import StringTable
+    from solver import first_solution
+    isolate_config(calcraze, config_dir)
+    pygame.init()
+    screen = pygame.display.set_mode((settings["window_width"], settings["window_height"]))
+    ld = StringTable("en", calcraze.DEFAULT_LANGUAGES["en"])
+    game = calcraze.FormulaFillGame(screen, settings, ld, "en")
+    st = game.state
+    st.total_rounds = 1 << 30
+    gs = st.grid_size
+
+    def one_round():
+        grid = [st.grid_numbers[r * gs:(r + 1) * gs] for r in range(gs)]
+        for r, c in first_solution(grid, st.skeleton, st.target_value):
+            st.select(r * gs + c)
+        game.evaluate_formula()
+
+    results["evaluate_formula"] = measure(one_round, 200 * scale, 7)
+    game.draw()
+    results["draw_frame"] = measure(game.draw, 50 * scale, 7)
+    results["draw_frame[full]"] = measure(lambda: game.draw_full(None), 50 * scale, 7)
+    pygame.quit()
+
+
+_COLD_START = r"""
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, os.path.join({root!r}, "benchmarks"))
+import pygame
+def _first_frame(*a, **k):
+    from frame_profiler import STARTUP
+    STARTUP.mark("first_frame")
+    sys.stdout.write("FIRST_FRAME " + json.dumps(dict(STARTUP.marks)) + "\n")
+    sys.stdout.flush()
+    os._exit(0)
+pygame.display.flip = _first_frame
+pygame.display.update = _first_frame
+import calcraze
+from bench import isolate_config
+isolate_config(calcraze, {config_dir!r})
+calcraze.main()
+"""
+
+
+def _stats(samples):
+    samples.sort()
+    return {
+        "median_us": statistics.median(samples),
+        "min_us": samples[0],
+        "max_us": samples[-1],
+        "number": 1,
+        "repeat": len(samples)
+    }
+
+
+def bench_cold_start(results, runs, config_dir):
+    samples = []
+    # 子进程里 STARTUP 记下的各启动阶段（导入、配置、语言、pygame 初始化……）
+    phases = {}
+    # 各次启动共用同一个临时 config 目录，和真实使用一样，第一次之后语言包和 Logo 缓存都是热的
+    code = _COLD_START.format(root=ROOT, config_dir=config_dir)
+    for _ in range(runs):
+        t = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, env=dict(os.environ), text=True)
+        for line in proc.stdout:
+            if line.startswith("FIRST_FRAME"):
+                samples.append((time.perf_counter() - t) * 1e6)
+                for name, ms in json.loads(line[len("FIRST_FRAME"):] or "{}").items():
+                    phases.setdefault(name, []).append(ms * 1000)
+                break
+        proc.wait()
+    if samples:
+        results["cold_start_first_frame"] = _stats(samples)
+    for name, values in phases.items():
+        results[f"cold_start[{name}]"] = _stats(values)
+
+
+def compare(results, baseline, threshold):
+    """返回 (名称, 基线中位数, 当前中位数, 比值, 是否回退) 列表。"""
+    rows = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = cur["median_us"] / base["median_us"] if base["median_us"] else float("inf")
+        rows.append((name, base["median_us"], cur["median_us"], ratio, ratio > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CalCraze performance benchmarks.")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median slowdown ratio counted as a regression")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    parser.add_argument("--only", nargs="*", default=None,
+                        choices=["generation", "evaluation", "game", "startup"], help="run only these groups")
+    args = parser.parse_args(argv)
+
+    with open(os.path.join(ROOT, "config", "settings.json"), "r", encoding="utf-8") as f:
+        settings = json.load(f)
+    scale = 1 if args.quick else 5
+    groups = args.only or ["generation", "evaluation", "game", "startup"]
+    results = {}
+    if "generation" in groups:
+        bench_generation(results, settings, scale)
+    if "evaluation" in groups:
+        bench_evaluation(results, scale)
+    with tempfile.TemporaryDirectory(prefix="calcraze-bench-") as config_dir:
+        if "game" in groups:
+            bench_game(results, settings, scale, os.path.join(config_dir, "game"))
+        if "startup" in groups:
+            bench_cold_start(results, 3 if args.quick else 10, os.path.join(config_dir, "startup"))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "results": results
+    }
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    for name, r in results.items():
+        print(f"{name:40s} {r['median_us']:12.2f} us  (min {r['min_us']:.2f})")
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        print("\nvs baseline:")
+        for name, base, cur, ratio, regressed in compare(results, baseline, args.threshold):
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:40s} {base:12.2f} -> {cur:12.2f} us  x{ratio:.2f}{flag}")
+            if regressed:
+                status = 1
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nBaseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,65 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import time
+_IMPORT_START = time.perf_counter()
+
+import atexit
+import copy
+import getpass
 import logging
-import pygame, sys, os, json, random, time, traceback
-from math import sin, cos, tan, floor, ceil, log, exp, sqrt
-from googletrans import Translator
+import pygame, sys, os, json, random, traceback
+from render_cache import TEXT_CACHE, render_text
+from fonts import FONTS
+from frame_scheduler import FrameScheduler
+from frame_profiler import PROFILER, STARTUP
+from grid_model import GridModel, fit_cell_size
+from translation import AutoTranslator, TranslationMemory, make_backend
+from assets import ASSETS, ASSETS_READY, BackgroundLoader
+from settings_store import SettingsStore
+from language_pack import LanguagePacks
+from animation import ANIMATIONS, TweenScheduler, bake_circle_fade, bake_fade_zoom, bake_rect_glow, bake_zoom
+from colors import BLACK, WHITE, GRAY, LIGHT_GRAY, GREEN, BLUE, RED, YELLOW, DARK_GRAY, BG_COLOR
+from widgets import SELECT_MARKER, TRANSLATIONS_READY, PopupMenu, ScrollView, VerticalMenu, run_widget
+import session_log
+from session_log import SessionClock, SessionRecorder
+from score_store import ScoreStore
+# 出题、题库相关模块（game_state、puzzle_bank）在开始游戏时才导入，启动时由后台线程预热
+
+STARTUP.restart(_IMPORT_START)
+STARTUP.mark("imports")
 
 # ------------------- 常量与默认配置 -------------------
 CONFIG_DIR      = "config"
 ASSETS_DIR      = "assets"
 HIGH_SCORE_FILE = "highscore.dat"
+SCORES_DB_FILE  = os.path.join(CONFIG_DIR, "scores.db")
+PUZZLE_BANK_FILE = os.path.join(CONFIG_DIR, "puzzle_bank.bin")
+FRAME_TRACE_FILE = os.path.join(CONFIG_DIR, "frame_trace.json")
+TRANSLATION_MEMORY_FILE = os.path.join(CONFIG_DIR, "translation_memory.json")
+LANGUAGES_FILE  = os.path.join(CONFIG_DIR, "languages.json")
+LANGUAGE_CACHE_FILE = os.path.join(CONFIG_DIR, "languages.cache")
+SESSIONS_DIR    = os.path.join(CONFIG_DIR, "sessions")
 LOGO_FILE       = os.path.join(ASSETS_DIR, "logo.png")
+IMAGE_CACHE_DIR = os.path.join(CONFIG_DIR, "image_cache")
+LOGO_SIZES      = (180, 135)
 BGM_FILE        = os.path.join(ASSETS_DIR, "bgm.mp3")
 
+# 从开始导入到第一帧菜单画面的预算
+STARTUP_BUDGET_MS = 500
+
+LEADERBOARD_SIZE = 10
+
 MENU_ANIMATION_SPEED = 15
+MENU_SCROLL_DURATION = 0.2
+MENU_ENTER_DURATION  = 5 / 60
+MENU_ENTER_SCALES    = (1.0, 1.1, 1.2, 1.3, 1.4)
 CELL_GLOW_DURATION   = 0.3
-
-BLACK      = (0, 0, 0)
-WHITE      = (255, 255, 255)
-GRAY       = (200, 200, 200)
-LIGHT_GRAY = (230, 230, 230)
-GREEN      = (0, 200, 0)
-BLUE       = (100, 100, 255)
-RED        = (255, 0, 0)
-YELLOW     = (255, 255, 0)
-DARK_GRAY  = (50, 50, 50)
-BG_COLOR   = (240, 240, 240)
+FEEDBACK_DURATION    = 1.5
+# 预烘焙的帧数：反馈文字、点击光圈、悬停光晕的透明度档位
+FEEDBACK_FRAMES      = 30
+CELL_GLOW_FRAMES     = 10
+HOVER_GLOW_LEVELS    = 11
 
 DEFAULT_SETTINGS = {
     "default_language": "en",
@@ -35,6 +69,11 @@ DEFAULT_SETTINGS = {
     "cell_size": 100,
     "fps": 30,
     "music_on": True,
+    "dirty_rendering": True,
+    "profiling": False,
+    "record_sessions": False,
+    "session_seed": None,
+    "translation_backend": "google",
     "difficulty": {
         "beginner":      {"min": 1, "max": 9,  "rounds": 7,  "time_limit": 30},
         "intermediate":  {"min": 1, "max": 15, "rounds": 10, "time_limit": 40},
@@ -67,6 +106,11 @@ DEFAULT_LANGUAGES = {
         ],
         "score_label": "Score",
         "high_score_label": "High Score",
+        "leaderboard_empty": "No games played yet.",
+        "leaderboard_hint": "Left/Right: difficulty   ESC: back",
+        "games_played_label": "Games",
+        "median_label": "Median",
+        "top_10_label": "Top 10%",
         "formula_label": "Formula",
         "round_label": "Round",
         "time_label": "Time",
@@ -116,6 +160,11 @@ DEFAULT_LANGUAGES = {
         ],
         "score_label": "分數",
         "high_score_label": "最高分",
+        "leaderboard_empty": "還沒有遊戲紀錄。",
+        "leaderboard_hint": "左/右：切換難度   ESC：返回",
+        "games_played_label": "局數",
+        "median_label": "中位數",
+        "top_10_label": "前 10%",
         "formula_label": "公式",
         "round_label": "回合",
         "time_label": "時間",
@@ -167,269 +216,149 @@ def save_json(path, data):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
+# 设置只在内容变化时由后台线程原子地写回，连续修改合并成一次写入
+SETTINGS_STORE = SettingsStore(os.path.join(CONFIG_DIR, "settings.json"), DEFAULT_SETTINGS)
+
+def _fill_settings(s):
+    s.setdefault("music_on", True)
+    s.setdefault("current_difficulty", "beginner")
+
 def load_settings():
-    s = load_json(os.path.join(CONFIG_DIR, "settings.json"), DEFAULT_SETTINGS)
-    if "music_on" not in s:
-        s["music_on"] = True
-    if "current_difficulty" not in s:
-        s["current_difficulty"] = "beginner"
-    save_json(os.path.join(CONFIG_DIR, "settings.json"), s)
-    return s
+    return SETTINGS_STORE.load(_fill_settings)
 
 def save_settings(s):
-    save_json(os.path.join(CONFIG_DIR, "settings.json"), s)
+    SETTINGS_STORE.save(s)
+
+# languages.json 编译后缓存在 languages.cache，文件没改时不再解析
+LANGUAGES = LanguagePacks(LANGUAGES_FILE, LANGUAGE_CACHE_FILE, DEFAULT_LANGUAGES)
 
 def load_languages():
-    return load_json(os.path.join(CONFIG_DIR, "languages.json"), DEFAULT_LANGUAGES)
+    return LANGUAGES.packs()
+
+def load_language(lang):
+    return LANGUAGES.table(lang)
 
 def save_languages(langs):
-    save_json(os.path.join(CONFIG_DIR, "languages.json"), langs)
+    save_json(LANGUAGES_FILE, langs)
 
-def load_high_score():
-    if os.path.exists(HIGH_SCORE_FILE):
-        try:
-            with open(HIGH_SCORE_FILE, "r", encoding="utf-8") as f:
-                return int(f.read().strip())
-        except:
-            return 0
-    return 0
-
-def save_high_score(v):
-    with open(HIGH_SCORE_FILE, "w", encoding="utf-8") as f:
-        f.write(str(v))
-
-# ------------------- Google 翻译补齐 -------------------
-def auto_translate(target_lang, src_dict):
-    translator = Translator()
-    new_dict = {}
-    for k, v in src_dict.items():
-        try:
-            if isinstance(v, list):
-                arr = []
-                for line in v:
-                    tr = translator.translate(line, dest=target_lang, src="en")
-                    arr.append(tr.text)
-                new_dict[k] = arr
-            else:
-                tr = translator.translate(v, dest=target_lang, src="en")
-                new_dict[k] = tr.text
-        except:
-            new_dict[k] = v
-    return new_dict
+# ------------------- 成绩库 -------------------
+# 每局结束的成绩都记进 SQLite 成绩库；旧版 highscore.dat 的最高分在第一次打开时导入
+SCORES = None
+
+def get_scores(settings=None):
+    global SCORES
+    if SCORES is None:
+        SCORES = ScoreStore(SCORES_DB_FILE)
+        atexit.register(SCORES.close)
+        if settings is not None:
+            SCORES.import_legacy(HIGH_SCORE_FILE, player_name(settings),
+                                 settings.get("current_difficulty", "beginner"))
+    return SCORES
+
+def player_name(settings):
+    name = settings.get("player_name")
+    if name:
+        return name
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "player"
+
+def load_high_score(settings):
+    return get_scores(settings).best(settings.get("current_difficulty", "beginner"))
+
+# ------------------- 自动翻译补齐 -------------------
+# 后台译好一批文字时发出 TRANSLATIONS_READY（定义在 widgets），游戏界面和菜单收到后重画
+TRANSLATOR = None
+
+def notify_translations(lang):
+    # 在翻译线程里调用，pygame.event.post 可以跨线程使用
+    if pygame.display.get_init():
+        pygame.event.post(pygame.event.Event(TRANSLATIONS_READY, lang=lang))
+
+def get_translator(backend=None):
+    global TRANSLATOR
+    if TRANSLATOR is None:
+        memory = TranslationMemory(TRANSLATION_MEMORY_FILE)
+        TRANSLATOR = AutoTranslator(memory, make_backend(backend or "google"), on_update=notify_translations)
+    return TRANSLATOR
 
 def ensure_language(lang_dict, lang_code):
-    defaults = DEFAULT_LANGUAGES["en"].keys()
-    current = lang_dict.get(lang_code, {})
-    missing = [k for k in defaults if k not in current]
+    # 缺的键先用翻译记忆库或英文原文补上，真正的翻译在后台进行，译好后直接写回这个字典
+    defaults = DEFAULT_LANGUAGES["en"]
+    current = lang_dict.setdefault(lang_code, {})
+    missing = {k: v for k, v in defaults.items() if k not in current}
     if missing:
-        print(f"Missing keys in {lang_code}: {missing}, auto-translating...")
-        for k in missing:
-            current[k] = auto_translate(lang_code, {k: DEFAULT_LANGUAGES["en"][k]})[k]
-        lang_dict[lang_code] = current
-        save_languages(lang_dict)
-    return lang_dict.get(lang_code, DEFAULT_LANGUAGES["en"])
-
-# ------------------- 安全运算函数 -------------------
-def safe_eval(expr):
-    try:
-        allowed = {"__builtins__": None, "sin": sin, "cos": cos, "tan": tan,
-                   "floor": floor, "ceil": ceil, "log": log, "exp": exp, "sqrt": sqrt}
-        return eval(expr, allowed)
-    except:
-        return None
+        logging.info(f"Missing keys in {lang_code}: {list(missing)}, auto-translating in background")
+    if missing or TRANSLATOR is not None:
+        get_translator().fill(current, lang_code, missing)
+    return current
 
 # ------------------- 系统字体函数 -------------------
-def sys_font(size=36):
-    try:
-        return pygame.font.Font(os.path.join("assets","fonts", "jf-openhuninn-2.1.ttf"), size)
-    except Exception as e:
-        logging.warning(f"Failed to load custom Chinese font: {e}")
-        return pygame.font.SysFont("PingFang TC", size)  # 尝试系统自带的
+def sys_font(size=36, language=None):
+    # 从字体注册表取字体，同一字体文件与字号只加载一次
+    return FONTS.get(size, language)
 
 
 # ------------------- 全屏垂直选单 -------------------
-def run_vertical_menu(screen, bar_height, logo_surf, font, title, items):
+def play_menu_enter(screen, font, text):
+    # 选中项放大的几帧只烘焙一次，之后每帧一次 blit
     clock = pygame.time.Clock()
-    selected = 0
-    y_offset = 0
-    animation_start = time.time()
-    running = True
-    while running:
+    strip = ANIMATIONS.get(("menu_enter", font, text),
+                           lambda: bake_zoom(render_text(font, text, True, BLUE), MENU_ENTER_SCALES))
+    center = (screen.get_width() // 2, screen.get_height() // 2)
+    tweens = TweenScheduler()
+    tweens.start("enter", MENU_ENTER_DURATION)
+    p = 0.0
+    while p is not None:
+        frame = strip.at(p)
         screen.fill(BG_COLOR)
-        pygame.draw.rect(screen, DARK_GRAY, (0, 0, screen.get_width(), bar_height))
-        if logo_surf:
-            lr = logo_surf.get_rect()
-            lr.centerx = screen.get_width() // 2
-            lr.centery = bar_height // 2
-            screen.blit(logo_surf, lr)
-        t_surf = font.render(title, True, BLACK)
-        t_rect = t_surf.get_rect(center=(screen.get_width() // 2, bar_height+50+y_offset))
-        screen.blit(t_surf, t_rect)
-        start_y = bar_height + 120 + y_offset
-        gap = 50
-        for i, opt in enumerate(items):
-            text = opt + (" ->" if i == selected else "")
-            color = BLUE if i == selected else BLACK
-            s = font.render(text, True, color)
-            screen.blit(s, (screen.get_width() // 2 - 100, start_y + i * gap))
+        screen.blit(frame, frame.get_rect(center=center))
         pygame.display.flip()
         clock.tick(60)
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_ESCAPE:
-                    return None
-                elif e.key == pygame.K_UP:
-                    selected = (selected - 1) % len(items)
-                    y_offset = MENU_ANIMATION_SPEED
-                    animation_start = time.time()
-                elif e.key == pygame.K_DOWN:
-                    selected = (selected + 1) % len(items)
-                    y_offset = -MENU_ANIMATION_SPEED
-                    animation_start = time.time()
-                elif e.key == pygame.K_RETURN:
-                    for i in range(5):
-                        scale = 1 + 0.1 * i
-                        tmp = font.render(items[selected] + " ->", True, BLUE)
-                        tmp = pygame.transform.smoothscale(tmp, (int(tmp.get_width() * scale), int(tmp.get_height() * scale)))
-                        screen.fill(BG_COLOR)
-                        screen.blit(tmp, tmp.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2)))
-                        pygame.display.flip()
-                        clock.tick(60)
-                    return selected
-        if time.time() - animation_start < 0.2:
-            y_offset *= 0.9
-        else:
-            y_offset = 0
+        p = tweens.progress("enter")
+
+def run_vertical_menu(screen, bar_height, logo_surf, font, title, items):
+    # title、items 可以是函数，后台翻译补齐文字后菜单按新文字重画
+    menu = VerticalMenu(screen, bar_height, logo_surf, font, title, items, TweenScheduler(),
+                        MENU_ANIMATION_SPEED, MENU_SCROLL_DURATION)
+    idx = run_widget(screen, menu)
+    if idx is not None:
+        play_menu_enter(screen, font, menu.list.labels[idx] + SELECT_MARKER)
+    return idx
 
 # ------------------- 弹窗菜单 -------------------
 def run_popup_menu(screen, items, font, title="Menu"):
-    clock = pygame.time.Clock()
-    running = True
-    selected = 0
-    w, h = 300, 200 + len(items) * 40
-    popup = pygame.Surface((w, h))
-    popup_rect = popup.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
-    bar_height = 40
-
-    def draw_popup():
-        overlay = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 120))
-        screen.blit(overlay, (0, 0))
-        popup.fill(WHITE)
-        pygame.draw.rect(popup, BLACK, popup.get_rect(), 2)
-        t_surf = font.render(title, True, BLACK)
-        popup.blit(t_surf, (10, 10))
-        for i, (key, label, _) in enumerate(items):
-            clr = BLUE if i == selected else BLACK
-            lbl = font.render(label + (" ->" if i == selected else ""), True, clr)
-            popup.blit(lbl, (20, bar_height + 40 * i))
-        screen.blit(popup, popup_rect)
-
-    while running:
-        screen.fill(BG_COLOR)
-        draw_popup()
-        pygame.display.flip()
-        clock.tick(60)
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_ESCAPE:
-                    running = False
-                elif e.key == pygame.K_UP:
-                    selected = (selected - 1) % len(items)
-                elif e.key == pygame.K_DOWN:
-                    selected = (selected + 1) % len(items)
-                elif e.key == pygame.K_RETURN:
-                    items[selected][2]()
-                    running = False
-            elif e.type == pygame.MOUSEBUTTONDOWN:
-                if not popup_rect.collidepoint(e.pos):
-                    running = False
-                else:
-                    rel_x = e.pos[0] - popup_rect.x
-                    rel_y = e.pos[1] - popup_rect.y
-                    if rel_y > bar_height:
-                        i = (rel_y - bar_height) // 40
-                        if 0 <= i < len(items):
-                            items[i][2]()
-                            running = False
+    # items 是 [(键, 文字, 回调)] 或返回它的函数，选中后调用回调
+    entries = items if callable(items) else lambda: items
+    idx = run_widget(screen, PopupMenu(screen, font, title, lambda: [label for _, label, _ in entries()]))
+    if idx is not None:
+        entries()[idx][2]()
 
 # ------------------- 语言切换弹窗 -------------------
-def run_language_popup(screen, ld, languages, settings):
-    font = sys_font(28)
+def run_language_popup(screen, ld, settings):
+    # 选项里同时有中英文，用中文字体显示
+    font = sys_font(28, "zh")
     items = [
-        ("en", "English", None),
-        ("zh", "中文(繁體)", None)
+        ("en", "English"),
+        ("zh", "中文(繁體)")
     ]
-    clock = pygame.time.Clock()
-    running = True
-    selected = 0
-    w, h = 280, 200 + len(items) * 40
-    popup = pygame.Surface((w, h))
-    popup_rect = popup.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
-    bar_height = 40
-    title = ld.get("language_prompt", "Select Language")
-    def draw_popup():
-        overlay = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 120))
-        screen.blit(overlay, (0, 0))
-        popup.fill(WHITE)
-        pygame.draw.rect(popup, BLACK, popup.get_rect(), 2)
-        t_surf = font.render(title, True, BLACK)
-        popup.blit(t_surf, (10, 10))
-        for i, (code, label, _) in enumerate(items):
-            clr = BLUE if i == selected else BLACK
-            lbl = font.render(label + (" ->" if i == selected else ""), True, clr)
-            popup.blit(lbl, (20, bar_height + 40 * i))
-        screen.blit(popup, popup_rect)
-    while running:
-        screen.fill(BG_COLOR)
-        draw_popup()
-        pygame.display.flip()
-        clock.tick(60)
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_ESCAPE:
-                    running = False
-                elif e.key == pygame.K_UP:
-                    selected = (selected - 1) % len(items)
-                elif e.key == pygame.K_DOWN:
-                    selected = (selected + 1) % len(items)
-                elif e.key == pygame.K_RETURN:
-                    chosen = items[selected][0]
-                    settings["default_language"] = chosen
-                    save_settings(settings)
-                    ensure_language(languages, chosen)
-                    running = False
-            elif e.type == pygame.MOUSEBUTTONDOWN:
-                if not popup_rect.collidepoint(e.pos):
-                    running = False
-                else:
-                    ry = e.pos[1] - popup_rect.y
-                    if ry > bar_height:
-                        i = (ry - bar_height) // 40
-                        if 0 <= i < len(items):
-                            chosen = items[i][0]
-                            settings["default_language"] = chosen
-                            save_settings(settings)
-                            ensure_language(languages, chosen)
-                            running = False
+    title = lambda: ld.get("language_prompt", "Select Language")
+    idx = run_widget(screen, PopupMenu(screen, font, title, [label for _, label in items], width=280))
+    if idx is not None:
+        settings["default_language"] = items[idx][0]
+        save_settings(settings)
 
 # ------------------- 难度选单 -------------------
 def run_difficulty_menu(screen, ld):
     font_big = sys_font(48)
-    items = [
+    items = lambda: [
         ld["difficulty_beginner"],
         ld["difficulty_intermediate"],
         ld["difficulty_advanced"],
         ld["back"]
     ]
-    idx = run_vertical_menu(screen, 80, None, font_big, ld["select_difficulty"], items)
+    idx = run_vertical_menu(screen, 80, None, font_big, lambda: ld["select_difficulty"], items)
     if idx is None or idx == 3:
         return None
     elif idx == 0:
@@ -439,44 +368,6 @@ def run_difficulty_menu(screen, ld):
     elif idx == 2:
         return "advanced"
 
-# ------------------- 生成整数公式 -------------------
-SKELETONS = [
-    ["A", "+", "B"],
-    ["A", "-", "B", "*", "C"],
-    ["(", "A", "+", "B", ")", "/", "C"],
-    ["A", "*", "B", "-", "C"],
-    ["(", "A", "-", "B", ")", "*", "C"],
-    ["A", "+", "B", "/", "C"]
-]
-
-def generate_integer_formula(skeletons, config):
-    while True:
-        sk = random.choice(skeletons)
-        placeholders = [s for s in sk if s in ["A", "B", "C", "D"]]
-        rcount = len(placeholders)
-        nums = [random.randint(config["min"], config["max"]) for _ in range(rcount)]
-        expr_parts = []
-        idx = 0
-        for s in sk:
-            if s in ["A", "B", "C", "D"]:
-                expr_parts.append(str(nums[idx]))
-                idx += 1
-            else:
-                expr_parts.append(s)
-        expr = "".join(expr_parts)
-        val = safe_eval(expr)
-        if val is not None and abs(val - round(val)) < 1e-9:
-            return sk, int(round(val))
-
-# ------------------- Cell 类 -------------------
-class Cell:
-    def __init__(self, row, col, number, x, y, size):
-        self.row = row
-        self.col = col
-        self.number = number
-        self.rect = pygame.Rect(x, y, size, size)
-        self.selected = False
-
 # ------------------- 顶部菜单类（弹窗） -------------------
 class TopMenu:
     def __init__(self, game, font):
@@ -485,52 +376,79 @@ class TopMenu:
         self.menu_bar_rect = pygame.Rect(0, 0, game.settings["window_width"], 80)
         self.menu_open = False
 
-    def draw(self):
-        pygame.draw.rect(self.game.screen, DARK_GRAY, self.menu_bar_rect)
+    def draw(self, surface=None):
+        surface = surface or self.game.screen
+        pygame.draw.rect(surface, DARK_GRAY, self.menu_bar_rect)
         if self.game.logo_surf:
             lr = self.game.logo_surf.get_rect()
             lr.center = (self.menu_bar_rect.centerx, self.menu_bar_rect.centery)
-            self.game.screen.blit(self.game.logo_surf, lr)
-        slogan = self.font.render("calcraze -- your math tutor", True, WHITE)
+            surface.blit(self.game.logo_surf, lr)
+        slogan = render_text(self.font, "calcraze -- your math tutor", True, WHITE)
         sr = slogan.get_rect(center=(self.menu_bar_rect.centerx, self.menu_bar_rect.centery+35))
-        self.game.screen.blit(slogan, sr)
-        txt = self.font.render("Menu", True, WHITE)
-        self.game.screen.blit(txt, (10, 10))
+        surface.blit(slogan, sr)
+        txt = render_text(self.font, "Menu", True, WHITE)
+        surface.blit(txt, (10, 10))
     
     def handle_event(self, e):
         if e.type == pygame.MOUSEBUTTONDOWN:
             if self.menu_bar_rect.collidepoint(e.pos):
                 self.show_popup_menu()
 
-    def show_popup_menu(self):
+    def popup_items(self):
         if self.game.paused:
             pause_label = self.game.lang_data["menu_resume"]
         else:
             pause_label = self.game.lang_data["menu_pause"]
-        items = [
+        return [
             ("new_game", self.game.lang_data["menu_new_game"], self.game.reset_game),
             ("pause",    pause_label, self.game.toggle_pause),
             ("settings", self.game.lang_data["menu_settings"], self.show_settings),
             ("quit_game", self.game.lang_data["menu_quit_game"], self.quit_game)
         ]
-        run_popup_menu(self.game.screen, items, self.font, "Menu")
+
+    def show_popup_menu(self):
+        run_popup_menu(self.game.screen, self.popup_items, self.font, "Menu")
+        PROFILER.discard_frame()
+        self.game.request_full_redraw()
 
     def show_settings(self):
         show_settings_menu(self.game.screen, self.game.lang_data, self.game.settings)
+        self.game.invalidate_layers()
 
     def quit_game(self):
+        self.game.save_session()
         pygame.quit()
         sys.exit()
 
 # ------------------- 游戏主类 -------------------
+# 规则与状态都在 GameState 里，这里只负责输入、渲染和音乐
 class FormulaFillGame:
-    def __init__(self, screen, settings, ld, language="en"):
+    def __init__(self, screen, settings, ld, language="en", seed=None, clock=None, interactive=True):
         self.screen = screen
         self.settings = settings
         self.lang_data = ld
         self.language = language
-        self.difficulty = settings.get("current_difficulty", "beginner")
-        self.config = settings["difficulty"][self.difficulty]
+        # interactive 为假时（回放）结束后不弹出 Game Over 画面
+        self.interactive = interactive
+        from game_state import GameState
+        from puzzle_bank import load_bank
+        # 对局由种子、设置和输入完全决定：时钟从开局算起，改变状态的输入都可以录下来重放
+        if seed is None:
+            seed = settings.get("session_seed")
+        self.seed = seed if seed is not None else session_log.new_seed()
+        self.clock = clock or SessionClock()
+        self.recorder = None
+        if settings.get("record_sessions"):
+            self.recorder = SessionRecorder(self.seed, copy.deepcopy(settings), self.clock,
+                                            session_log.bank_fingerprint(PUZZLE_BANK_FILE))
+        high_score = load_high_score(settings)
+        bank = load_bank(PUZZLE_BANK_FILE)
+        # 加载题库、建索引的耗时不算进第一回合：时钟从这里重新计时，
+        # 建 GameState 时钟停在 0，第一回合和回放时一样从 0 开始
+        self.clock.restart()
+        with self.clock.held(0):
+            self.state = GameState(settings, high_score, clock=self.clock,
+                                   rng=random.Random(self.seed), bank=bank)
         self.grid_size = settings["grid_size"]
         self.cell_size = settings["cell_size"]
         self.fps = settings["fps"]
@@ -538,169 +456,300 @@ class FormulaFillGame:
         self.small_font = sys_font(20)
         self.large_font = sys_font(36)
         self.menu_font = sys_font(24)
-        self.clock = pygame.time.Clock()
-        self.score = 0
-        self.high_score = load_high_score()
-        self.current_round = 1
-        self.total_rounds = self.config.get("rounds", 7)
-        self.time_limit = self.config.get("time_limit", 30)
-        self.start_time = time.time()
-        self.paused = False
-        self.selected_cells = []
+        self.profiler_font = sys_font(12)
+        self.scheduler = FrameScheduler(self.fps)
         self.show_help = False
         self.running = True
-        self.feedback_message = ""
-        self.feedback_time = 0
-
-        self.logo_surf = None
-        if os.path.exists(LOGO_FILE):
-            try:
-                tmp = pygame.image.load(LOGO_FILE)
-                self.logo_surf = pygame.transform.scale(tmp, (135, 135))
-            except:
-                self.logo_surf = None
 
         self.top_menu = TopMenu(self, self.menu_font)
         self.menu_bar_height = 80
         self.scoreboard_height = 120
 
-        self.grid = []
-        self.skeleton = []
-        self.placeholder_count = 0
-        self.formula_str = ""
-        self.target_value = 0
-        self.cell_glow_time = 0
-        self.init_game()
-
-    def init_game(self):
+        self.grid = None
         self.init_grid()
-        self.init_formula()
-        self.start_time = time.time()
+
+        # 反馈文字、点击光圈的进度都由补间按时间算出，与帧率无关
+        self.tweens = TweenScheduler(lambda: self.state.clock())
+        self.feedback_started = None
+
+        # 局部重绘：只把状态变化的区域用 display.update 推上屏幕
+        self.dirty_rendering = settings.get("dirty_rendering", True)
+        self.full_redraw = True
+        self.last_keys = {}
+        self.background = None
+        self.background_key = None
+        self.profiler_rect = None
+
+    @property
+    def logo_surf(self):
+        return ASSETS.logo(135)
+
+    @property
+    def paused(self):
+        return self.state.paused
+
+    def record(self, code, arg=None):
+        if self.recorder:
+            self.recorder.log(code, arg)
+
+    def save_session(self):
+        # 录像写到 SESSIONS_DIR，文件名带时间和种子；同一局只写一次
+        if not self.recorder or self.recorder.result is not None:
+            return None
+        self.recorder.finish(self.state)
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{self.seed}.json"
+        try:
+            return self.recorder.save(os.path.join(SESSIONS_DIR, name))
+        except OSError as e:
+            logging.warning(f"Failed to save session: {e}")
+            return None
 
     def reset_game(self):
-        self.score = 0
-        self.current_round = 1
         self.running = True
-        self.selected_cells = []
-        self.paused = False
-        self.feedback_message = ""
-        self.feedback_time = 0
-        self.init_game()
+        with self.clock.held():
+            self.record(session_log.RESET)
+            self.state.reset()
 
     def toggle_pause(self):
-        if self.paused:
-            self.paused = False
-            self.start_time = time.time()
-            if self.settings["music_on"]:
-                pygame.mixer.music.unpause()
-        else:
-            self.paused = True
-            pygame.mixer.music.pause()
+        with self.clock.held():
+            self.record(session_log.PAUSE)
+            self.state.toggle_pause()
+        if self.state.paused:
+            pause_music()
+        elif self.settings["music_on"]:
+            resume_music()
 
     def init_grid(self):
-        self.grid = []
         ox = 50
         oy = self.menu_bar_height + self.scoreboard_height + 20
-        for r in range(self.grid_size):
-            row = []
-            for c in range(self.grid_size):
-                n = random.randint(self.config["min"], self.config["max"])
-                x = ox + c * self.cell_size
-                y = oy + r * self.cell_size
-                row.append(Cell(r, c, n, x, y, self.cell_size))
-            self.grid.append(row)
-
-    def init_formula(self):
-        sk, val = generate_integer_formula(SKELETONS, self.config)
-        self.skeleton = sk
-        self.target_value = val
-        placeholders = [s for s in sk if s in ["A", "B", "C", "D"]]
-        self.placeholder_count = len(placeholders)
-        disp = ["?" if s in ["A", "B", "C", "D"] else s for s in sk]
-        self.formula_str = " ".join(disp)
-
-    def get_dynamic_formula(self):
-        res = []
-        idx = 0
-        for token in self.skeleton:
-            if token in ["A", "B", "C", "D"]:
-                if idx < len(self.selected_cells):
-                    res.append(str(self.selected_cells[idx].number))
-                else:
-                    res.append("?")
-                idx += 1
-            else:
-                res.append(token)
-        return " ".join(res)
+        # 大棋盘按窗口缩小格子，格子里的数字字号跟着缩小
+        self.cell_size = fit_cell_size(self.grid_size, self.settings["cell_size"],
+                                       self.settings["window_width"] - 2 * ox,
+                                       self.settings["window_height"] - oy - 20)
+        self.cell_font = sys_font(min(28, max(8, self.cell_size // 2)))
+        self.cell_border = 4 if self.cell_size >= 24 else 2
+        self.grid = GridModel(self.grid_size, self.cell_size, (ox, oy))
 
     def draw(self):
-        self.screen.fill(BG_COLOR)
-        self.top_menu.draw()
-        scoreboard_rect = pygame.Rect(0, self.menu_bar_height, self.settings["window_width"], self.scoreboard_height)
-        pygame.draw.rect(self.screen, LIGHT_GRAY, scoreboard_rect)
-        pygame.draw.rect(self.screen, BLACK, scoreboard_rect, 2)
-        self.draw_scoreboard(scoreboard_rect)
-        self.draw_grid()
-        if self.paused:
-            p_text = self.lang_data.get("paused_text", "PAUSED")
-            p_surf = self.large_font.render(p_text, True, RED)
-            self.screen.blit(p_surf, p_surf.get_rect(center=(self.settings["window_width"]//2, self.settings["window_height"]//2)))
-        if self.show_help:
-            self.draw_help_overlay()
-        pygame.display.flip()
+        hover = self.get_cell_by_pos(pygame.mouse.get_pos())
+        keys = self.region_keys(hover)
+        if not self.dirty_rendering or self.full_redraw:
+            self.draw_full(hover)
+        elif keys["cells"][0] != self.last_keys.get("cells", (None,))[0]:
+            # 换了一局，整个棋盘都变了
+            self.draw_full(hover)
+        elif keys["overlay"] != self.last_keys.get("overlay") or any(keys["overlay"]):
+            # 有暂停/帮助遮罩时不做局部更新，任何变化都整屏重绘
+            if keys != self.last_keys:
+                self.draw_full(hover)
+        else:
+            self.draw_dirty(hover, keys)
+        self.last_keys = keys
+
+    def region_keys(self, hover):
+        # 每个区域的可见状态，与上一帧不同的区域才需要重绘
+        st = self.state
+        p = self.feedback_progress()
+        feedback = (st.feedback, self.feedback_strip().index(p)) if p is not None else None
+        scoreboard = (st.score, st.high_score, st.current_round, st.total_rounds,
+                      st.remaining_time(), st.formula_text(), st.target_value, feedback)
+        # 棋盘只记回合、选中顺序和悬停状态，比较代价与棋盘大小无关
+        hovered = None
+        if hover is not None:
+            glow = self.tweens.progress("cell_glow")
+            hovered = (hover, self.hover_glow_level(),
+                       self.cell_glow_strip().index(glow) if glow is not None else None)
+        cells = (st.round_id, tuple(st.selected), hovered)
+        return {"overlay": (self.paused, self.show_help), "scoreboard": scoreboard, "cells": cells}
+
+    def request_full_redraw(self):
+        self.full_redraw = True
+
+    def draw_full(self, hover):
+        with PROFILER.phase("background"):
+            self.ensure_background()
+            self.screen.blit(self.background, (0, 0))
+        with PROFILER.phase("scoreboard"):
+            self.draw_scoreboard(self.scoreboard_rect())
+        with PROFILER.phase("grid"):
+            self.draw_grid(hover)
+        with PROFILER.phase("overlay"):
+            if self.paused:
+                p_text = self.lang_data.get("paused_text", "PAUSED")
+                p_surf = render_text(self.large_font, p_text, True, RED)
+                self.screen.blit(p_surf, p_surf.get_rect(center=(self.settings["window_width"]//2, self.settings["window_height"]//2)))
+            if self.show_help:
+                self.draw_help_overlay()
+            self.profiler_rect = None
+            if PROFILER.overlay_visible:
+                self.draw_profiler_overlay()
+        with PROFILER.phase("flip"):
+            pygame.display.flip()
+        self.full_redraw = False
+
+    def draw_dirty(self, hover, keys):
+        with PROFILER.phase("background"):
+            self.ensure_background()
+        rects = []
+        with PROFILER.phase("scoreboard"):
+            if keys["scoreboard"] != self.last_keys.get("scoreboard"):
+                area = self.scoreboard_area()
+                self.screen.set_clip(area)
+                self.screen.blit(self.background, area, area)
+                self.draw_scoreboard(self.scoreboard_rect())
+                rects.append(area)
+        with PROFILER.phase("grid"):
+            mask = self.state.selected_mask
+            hover_area = self.grid.rect(hover).inflate(4, 4) if hover is not None else None
+            for i in self.changed_cells(self.last_keys.get("cells"), keys["cells"]):
+                # 悬停光晕会画出格子外 2 像素，连同相邻格子一起在裁剪区域内重画
+                area = self.grid.rect(i).inflate(6, 6)
+                self.screen.set_clip(area)
+                self.screen.blit(self.background, area, area)
+                for n in self.grid.neighbors(i):
+                    if mask[n]:
+                        self.draw_cell(self.screen, n, GREEN)
+                if hover_area is not None and area.colliderect(hover_area):
+                    self.draw_hover(hover)
+                rects.append(area)
+        self.screen.set_clip(None)
+        with PROFILER.phase("overlay"):
+            if PROFILER.overlay_visible:
+                # 统计文字长短会变，先用背景盖掉上一次的范围
+                old = self.profiler_rect
+                area = self.draw_profiler_overlay(restore=True)
+                rects.append(area.union(old) if old else area)
+        with PROFILER.phase("flip"):
+            if rects:
+                pygame.display.update(rects)
+
+    def changed_cells(self, old, new):
+        # 选中状态变了的格子，加上前后两帧的悬停格子
+        changed = set(old[1]).symmetric_difference(new[1])
+        if old[2] != new[2]:
+            for h in (old[2], new[2]):
+                if h is not None:
+                    changed.add(h[0])
+        return sorted(changed)
+
+    def draw_profiler_overlay(self, restore=False):
+        budget = 1000 / self.fps if self.fps else 0
+        surf = PROFILER.overlay_surface(self.profiler_font, "game", budget)
+        rect = surf.get_rect(topright=(self.settings["window_width"] - 4, 3))
+        if restore and self.profiler_rect:
+            self.screen.blit(self.background, self.profiler_rect, self.profiler_rect)
+        self.screen.blit(surf, rect)
+        self.profiler_rect = rect
+        return rect
+
+    # ---------- 静态图层 ----------
+    def invalidate_layers(self):
+        self.background_key = None
+        self.request_full_redraw()
+
+    def ensure_background(self):
+        # 菜单栏、记分板底框、棋盘边框和未选中的格子（含数字）合成一张背景，
+        # 只有换回合、换语言或窗口尺寸变化时才重建
+        key = (self.state.round_id, self.screen.get_size())
+        if key == self.background_key and self.background is not None:
+            return
+        bg = pygame.Surface(self.screen.get_size()).convert()
+        bg.fill(BG_COLOR)
+        self.top_menu.draw(bg)
+        rect = self.scoreboard_rect()
+        pygame.draw.rect(bg, LIGHT_GRAY, rect)
+        pygame.draw.rect(bg, BLACK, rect, 2)
+        pygame.draw.rect(bg, BLACK, self.grid.bounds().inflate(10, 10), 2)
+        for i in range(self.grid.count):
+            self.draw_cell(bg, i, GRAY)
+        self.background = bg
+        self.background_key = key
+
+    def scoreboard_area(self):
+        # 反馈文字放大时会超出记分板底部，区域向下多留一些
+        return pygame.Rect(0, self.menu_bar_height, self.settings["window_width"], self.scoreboard_height + 14)
+
+    def scoreboard_rect(self):
+        return pygame.Rect(0, self.menu_bar_height, self.settings["window_width"], self.scoreboard_height)
 
     def draw_scoreboard(self, rect):
-        elapsed = 0 if self.paused else time.time() - self.start_time
-        rem = max(0, int(self.time_limit - elapsed))
-        sc_txt = f"{self.lang_data['score_label']}: {self.score}"
-        hs_txt = f"{self.lang_data['high_score_label']}: {self.high_score}"
-        rd_txt = f"{self.lang_data['round_label']}: {self.current_round}/{self.total_rounds}"
-        tm_txt = f"{self.lang_data['time_label']}: {rem}s"
-        self.screen.blit(self.font.render(sc_txt, True, BLACK), (20, rect.y + 10))
-        self.screen.blit(self.font.render(hs_txt, True, BLACK), (300, rect.y + 10))
-        self.screen.blit(self.font.render(rd_txt, True, BLACK), (20, rect.y + 50))
-        self.screen.blit(self.font.render(tm_txt, True, BLACK), (300, rect.y + 50))
-        dyn = self.get_dynamic_formula()
-        formula_disp = f"{self.lang_data['formula_label']}: {dyn} = {self.target_value}"
-        self.screen.blit(self.small_font.render(formula_disp, True, BLACK), (20, rect.y + 85))
-        if self.feedback_message and time.time()-self.feedback_time < 1.5:
-            prog = (time.time()-self.feedback_time) / 1.5
-            alpha = int(255*(1-prog**2))
-            scale = 1+0.2*(1-prog)
-            fb_surf = self.font.render(self.feedback_message, True, YELLOW)
-            fb_surf.set_alpha(alpha)
-            scaled = pygame.transform.smoothscale(fb_surf, (int(fb_surf.get_width()*scale), int(fb_surf.get_height()*scale)))
-            r_fb = scaled.get_rect(center=(self.settings["window_width"]//2, rect.y+100))
-            self.screen.blit(scaled, r_fb)
-
-    def draw_grid(self):
-        ox = 50
-        oy = self.menu_bar_height + self.scoreboard_height + 20
-        gw = self.grid_size * self.cell_size
-        gh = self.grid_size * self.cell_size
-        pygame.draw.rect(self.screen, BLACK, (ox-5, oy-5, gw+10, gh+10), 2)
-        mouse_pos = pygame.mouse.get_pos()
-        hover_cell = None
-        for row in self.grid:
-            for c in row:
-                color = GREEN if c.selected else GRAY
-                pygame.draw.rect(self.screen, color, c.rect)
-                pygame.draw.rect(self.screen, BLACK, c.rect, 2)
-                if c.rect.collidepoint(mouse_pos):
-                    hover_cell = c
-                    glow_alpha = 50 + 50 * abs((pygame.time.get_ticks() % 1000)/500 - 1)
-                    glow = pygame.Surface((c.rect.width+4, c.rect.height+4), pygame.SRCALPHA)
-                    pygame.draw.rect(glow, (255,255,0,int(glow_alpha)), glow.get_rect(), border_radius=5)
-                    self.screen.blit(glow, (c.rect.x-2, c.rect.y-2))
-                ns = self.font.render(str(c.number), True, BLACK)
-                nr = ns.get_rect(center=c.rect.center)
-                self.screen.blit(ns, nr)
-        if self.cell_glow_time > 0 and hover_cell:
-            alpha = int(255*(self.cell_glow_time/CELL_GLOW_DURATION))
-            glow_circle = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
-            pygame.draw.circle(glow_circle, (255,215,0,alpha), (self.cell_size//2, self.cell_size//2), self.cell_size//3)
-            self.screen.blit(glow_circle, hover_cell.rect)
-            self.cell_glow_time -= self.clock.get_time()/1000
+        st = self.state
+        rem = st.remaining_time()
+        ld = self.lang_data
+        sc_txt = ld.label("score_label") + str(st.score)
+        hs_txt = ld.label("high_score_label") + str(st.high_score)
+        rd_txt = f"{ld.label('round_label')}{st.current_round}/{st.total_rounds}"
+        tm_txt = f"{ld.label('time_label')}{rem}s"
+        self.screen.blit(render_text(self.font, sc_txt, True, BLACK), (20, rect.y + 10))
+        self.screen.blit(render_text(self.font, hs_txt, True, BLACK), (300, rect.y + 10))
+        self.screen.blit(render_text(self.font, rd_txt, True, BLACK), (20, rect.y + 50))
+        self.screen.blit(render_text(self.font, tm_txt, True, BLACK), (300, rect.y + 50))
+        dyn = st.formula_text()
+        formula_disp = f"{ld.label('formula_label')}{dyn} = {st.target_value}"
+        self.screen.blit(render_text(self.small_font, formula_disp, True, BLACK), (20, rect.y + 85))
+        p = self.feedback_progress()
+        if p is not None:
+            frame = self.feedback_strip().at(p)
+            self.screen.blit(frame, frame.get_rect(center=(self.settings["window_width"]//2, rect.y+100)))
+
+    # ---------- 动画 ----------
+    def feedback_progress(self):
+        # 补间从 GameState 记下反馈的时刻开始；播完或没有反馈时返回 None
+        st = self.state
+        if not st.feedback:
+            self.tweens.stop("feedback")
+            return None
+        if st.feedback_time != self.feedback_started:
+            self.feedback_started = st.feedback_time
+            self.tweens.start("feedback", FEEDBACK_DURATION, start=st.feedback_time)
+        return self.tweens.progress("feedback")
+
+    def feedback_strip(self):
+        # 放大 1.2 倍后缩回原大小，同时淡出
+        text = self.lang_data["feedback_" + self.state.feedback]
+        return ANIMATIONS.get(("feedback", self.font, text), lambda: bake_fade_zoom(
+            render_text(self.font, text, True, YELLOW), FEEDBACK_FRAMES,
+            scale=lambda p: 1 + 0.2 * (1 - p), alpha=lambda p: 255 * (1 - p ** 2)))
+
+    def hover_glow_level(self):
+        # 悬停光晕的透明度在 50~100 之间按 1 秒周期往返，分成 HOVER_GLOW_LEVELS 档
+        t = abs((pygame.time.get_ticks() % 1000) / 500 - 1)
+        return round(t * (HOVER_GLOW_LEVELS - 1))
+
+    def hover_strip(self):
+        size = (self.cell_size + 4, self.cell_size + 4)
+        alphas = [50 + 50 * i // (HOVER_GLOW_LEVELS - 1) for i in range(HOVER_GLOW_LEVELS)]
+        return ANIMATIONS.get(("hover", size), lambda: bake_rect_glow(size, (255, 255, 0), alphas))
+
+    def cell_glow_strip(self):
+        cs = self.cell_size
+        return ANIMATIONS.get(("cell_glow", cs),
+                              lambda: bake_circle_fade(cs, (255, 215, 0), cs // 3, CELL_GLOW_FRAMES))
+
+    def draw_cell(self, surface, i, color):
+        # 用两次 fill 画边框（小格子 1 像素，否则 2 像素）：draw.rect 带宽度时会沿裁剪区域边缘多画一圈边
+        rect = self.grid.rect(i)
+        surface.fill(BLACK, rect)
+        surface.fill(color, rect.inflate(-self.cell_border, -self.cell_border))
+        ns = render_text(self.cell_font, str(self.state.grid_numbers[i]), True, BLACK)
+        nr = ns.get_rect(center=rect.center)
+        surface.blit(ns, nr)
+
+    def draw_hover(self, i):
+        rect = self.grid.rect(i)
+        self.screen.blit(self.hover_strip().frames[self.hover_glow_level()], (rect.x-2, rect.y-2))
+        ns = render_text(self.cell_font, str(self.state.grid_numbers[i]), True, BLACK)
+        self.screen.blit(ns, ns.get_rect(center=rect.center))
+        glow = self.tweens.progress("cell_glow")
+        if glow is not None:
+            self.screen.blit(self.cell_glow_strip().at(glow), rect)
+
+    def draw_grid(self, hover):
+        # 背景里已有未选中的格子，这里只画选中的格子和悬停效果
+        for i in self.state.selected:
+            self.draw_cell(self.screen, i, GREEN)
+        if hover is not None:
+            self.draw_hover(hover)
 
     def draw_help_overlay(self):
         w = self.settings["window_width"] - 100
@@ -709,223 +758,243 @@ class FormulaFillGame:
         help_surf.fill(WHITE)
         pygame.draw.rect(help_surf, BLACK, help_surf.get_rect(), 2)
         r = help_surf.get_rect(center=(self.settings["window_width"]//2, self.settings["window_height"]//2))
-        t_surf = self.font.render(self.lang_data["help_title"], True, BLACK)
+        t_surf = render_text(self.font, self.lang_data["help_title"], True, BLACK)
         help_surf.blit(t_surf, (20,20))
         y = 70
         for line in self.lang_data["help_lines"]:
-            ls = self.small_font.render(line, True, BLACK)
+            ls = render_text(self.small_font, line, True, BLACK)
             help_surf.blit(ls, (20,y))
             y += 30
         self.screen.blit(help_surf, r)
 
-    def handle_click_cell(self, cell):
-        if cell in self.selected_cells:
-            cell.selected = False
-            self.selected_cells.remove(cell)
-        elif len(self.selected_cells) < self.placeholder_count:
-            cell.selected = True
-            self.selected_cells.append(cell)
-            self.cell_glow_time = CELL_GLOW_DURATION
+    def handle_click_cell(self, index):
+        with self.clock.held():
+            self.record(session_log.SELECT, index)
+            selected = self.state.select(index)
+        if selected:
+            self.tweens.start("cell_glow", CELL_GLOW_DURATION)
 
-    def evaluate_formula(self):
-        if len(self.selected_cells) < self.placeholder_count:
-            return
-        copy_skel = list(self.skeleton)
-        idx = 0
-        for i, token in enumerate(copy_skel):
-            if token in ["A", "B", "C", "D"]:
-                copy_skel[i] = str(self.selected_cells[idx].number)
-                idx += 1
-        expr = "".join(copy_skel)
-        res = safe_eval(expr)
-        if res is not None and abs(res - self.target_value) < 1e-9:
-            self.score += 10
-            self.feedback_message = self.lang_data["feedback_correct"]
-        else:
-            self.score -= 5
-            self.feedback_message = self.lang_data["feedback_wrong"]
-        self.feedback_time = time.time()
-        for c in self.selected_cells:
-            c.selected = False
-        self.selected_cells = []
-        self.current_round += 1
-        if self.current_round > self.total_rounds:
-            self.running = False
-            self.show_game_over()
-        else:
-            self.init_game()
-
-    def handle_time_over(self):
-        self.score -= 5
-        self.feedback_message = self.lang_data["feedback_timeout"]
-        self.feedback_time = time.time()
-        for c in self.selected_cells:
-            c.selected = False
-        self.selected_cells = []
-        self.current_round += 1
-        if self.current_round > self.total_rounds:
+    def check_finished(self):
+        if self.state.finished:
             self.running = False
-            self.show_game_over()
-        else:
-            self.init_game()
+            if self.interactive:
+                self.show_game_over()
+
+    def evaluate_formula(self):
+        with self.clock.held():
+            self.record(session_log.SUBMIT)
+            self.state.submit()
+        self.check_finished()
+
+    def undo(self):
+        with self.clock.held():
+            self.record(session_log.UNDO)
+            self.state.undo()
+
+    def update_timer(self):
+        # 只有真的超时才记一条，时间就是状态机判定超时的那一刻
+        with self.clock.held():
+            if self.state.tick():
+                self.record(session_log.TIMEOUT)
+        self.check_finished()
 
     def show_game_over(self):
+        PROFILER.discard_frame()
         done = True
+        dirty = True
         while done:
-            self.screen.fill(BG_COLOR)
-            ot = self.large_font.render(self.lang_data["game_over"], True, RED)
-            st = self.large_font.render(f"{self.lang_data['score_label']}: {self.score}", True, BLACK)
-            self.screen.blit(ot, ot.get_rect(center=(self.settings["window_width"]//2, 200)))
-            self.screen.blit(st, st.get_rect(center=(self.settings["window_width"]//2, 300)))
-            pygame.display.flip()
-            for e in pygame.event.get():
+            if dirty:
+                self.screen.fill(BG_COLOR)
+                ot = render_text(self.large_font, self.lang_data["game_over"], True, RED)
+                st = render_text(self.large_font, self.lang_data.label("score_label") + str(self.state.score), True, BLACK)
+                self.screen.blit(ot, ot.get_rect(center=(self.settings["window_width"]//2, 200)))
+                self.screen.blit(st, st.get_rect(center=(self.settings["window_width"]//2, 300)))
+                pygame.display.flip()
+                dirty = False
+            for e in self.scheduler.wait():
                 if e.type == pygame.QUIT:
                     pygame.quit(); sys.exit()
+                elif e.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    dirty = True
                 elif e.type == pygame.KEYDOWN:
                     if e.key == pygame.K_RETURN:
                         done = False
                         return
 
     def get_cell_by_pos(self, pos):
-        for row in self.grid:
-            for c in row:
-                if c.rect.collidepoint(pos):
-                    return c
-        return None
+        """返回坐标下格子的下标，不在棋盘上时返回 None。"""
+        return self.grid.index_at(pos)
+
+    def record_score(self):
+        # 只记录打完全部回合的对局，中途退出的不算
+        st = self.state
+        if st.finished:
+            get_scores(self.settings).record(player_name(self.settings), st.difficulty, st.score, st.total_rounds)
 
-    def update_high_score(self):
-        if self.score > self.high_score:
-            save_high_score(self.score)
+    # ---------- 帧调度 ----------
+    def is_animating(self):
+        # 反馈文字淡出、点击光圈是补间动画，悬停光晕跟着鼠标，都需要按帧率重画
+        self.feedback_progress()
+        if self.tweens.active():
+            return True
+        if self.paused or self.show_help:
+            return False
+        return self.get_cell_by_pos(pygame.mouse.get_pos()) is not None
+
+    def next_deadline(self):
+        # 下一次计时器跳秒的时间；帮助遮罩下不判定超时，归零后就不用再等
+        d = self.state.seconds_until_tick()
+        if self.show_help and not d:
+            return None
+        return d
 
     def run(self):
         while self.running:
-            self.clock.tick(self.fps)
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    self.running = False
-                    pygame.quit(); sys.exit()
-                self.top_menu.handle_event(e)
-                if e.type == pygame.KEYDOWN:
-                    if (e.mod & pygame.KMOD_META and e.key == pygame.K_h) or (e.mod & pygame.KMOD_CTRL and e.key == pygame.K_h):
-                        self.show_help = not self.show_help
-                    if self.show_help:
-                        if e.key == pygame.K_ESCAPE:
-                            self.show_help = False
-                    else:
-                        if e.key == pygame.K_ESCAPE:
-                            pass
-                        elif e.key == pygame.K_RETURN:
-                            self.evaluate_formula()
-                        elif e.key == pygame.K_BACKSPACE:
-                            if self.selected_cells:
-                                last = self.selected_cells.pop()
-                                last.selected = False
-                elif e.type == pygame.MOUSEBUTTONDOWN and not self.show_help and not self.paused:
-                    pos = e.pos
-                    cell = self.get_cell_by_pos(pos)
-                    if cell:
-                        self.handle_click_cell(cell)
             if not self.paused and not self.show_help:
-                if time.time() - self.start_time > self.time_limit:
-                    self.handle_time_over()
+                with PROFILER.phase("update"):
+                    self.update_timer()
+            if not self.running:
+                break
             self.draw()
-        self.update_high_score()
+            PROFILER.end_frame()
+            events = self.scheduler.wait(self.is_animating(), self.next_deadline())
+            PROFILER.begin_frame("game")
+            with PROFILER.phase("event"):
+                for e in events:
+                    if e.type == pygame.QUIT:
+                        self.running = False
+                        self.save_session()
+                        pygame.quit(); sys.exit()
+                    self.top_menu.handle_event(e)
+                    if e.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                        self.request_full_redraw()
+                    elif e.type in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED, TRANSLATIONS_READY, ASSETS_READY):
+                        self.invalidate_layers()
+                    if e.type == pygame.KEYDOWN:
+                        if e.key == pygame.K_F3:
+                            PROFILER.toggle_overlay()
+                            self.request_full_redraw()
+                        if (e.mod & pygame.KMOD_META and e.key == pygame.K_h) or (e.mod & pygame.KMOD_CTRL and e.key == pygame.K_h):
+                            self.show_help = not self.show_help
+                        if self.show_help:
+                            if e.key == pygame.K_ESCAPE:
+                                self.show_help = False
+                        else:
+                            if e.key == pygame.K_ESCAPE:
+                                pass
+                            elif e.key == pygame.K_RETURN:
+                                self.evaluate_formula()
+                            elif e.key == pygame.K_BACKSPACE:
+                                self.undo()
+                    elif e.type == pygame.MOUSEBUTTONDOWN and not self.show_help and not self.paused:
+                        pos = e.pos
+                        cell = self.get_cell_by_pos(pos)
+                        if cell is not None:
+                            self.handle_click_cell(cell)
+        self.record_score()
+        self.save_session()
 
 # ------------------- Settings 菜单 -------------------
 def show_settings_menu(screen, ld, settings):
     font_big = sys_font(36)
+    items = lambda: [
+        ld["toggle_music"] + ("On" if settings["music_on"] else "Off"),
+        ld["change_difficulty"],
+        ld["change_language"],
+        ld["back"]
+    ]
     while True:
-        music_label = ld["toggle_music"] + ("On" if settings["music_on"] else "Off")
-        items = [
-            music_label,
-            ld["change_difficulty"],
-            ld["change_language"],
-            ld["back"]
-        ]
-        idx = run_vertical_menu(screen, 80, None, font_big, ld["settings_title"], items)
+        idx = run_vertical_menu(screen, 80, None, font_big, lambda: ld["settings_title"], items)
         if idx is None:
             return
         elif idx == 0:
             settings["music_on"] = not settings["music_on"]
             save_settings(settings)
             if settings["music_on"]:
-                try:
-                    pygame.mixer.music.unpause()
-                except:
-                    pass
+                resume_music()
             else:
-                pygame.mixer.music.pause()
+                pause_music()
         elif idx == 1:
             d = run_difficulty_menu(screen, ld)
             if d:
                 settings["current_difficulty"] = d
                 save_settings(settings)
         elif idx == 2:
-            run_language_popup(screen, ld, load_languages(), settings)
+            run_language_popup(screen, ld, settings)
             new_lang = settings.get("default_language", "en")
-            ld.update(load_languages().get(new_lang, DEFAULT_LANGUAGES["en"]))
+            FONTS.set_language(new_lang)
+            # 原地替换 ld，后台译好的文字会直接补进来
+            ld.reset(new_lang, load_languages().get(new_lang, {}))
+            ensure_language({new_lang: ld}, new_lang)
         elif idx == 3:
             return
 
 # ------------------- 帮助、高分界面 -------------------
 def show_help_menu(screen, ld):
-    font_big = sys_font(36)
-    font_small = sys_font(24)
-    running = True
-    scroll_offset = 0
-    content_height = len(ld["help_lines"]) * 40 + 200
-    clock = pygame.time.Clock()
-    while running:
-        for e in pygame.event.get():
-            if e.type == pygame.MOUSEBUTTONDOWN:
-                if e.button == 4:
-                    scroll_offset = min(0, scroll_offset + 20)
-                elif e.button == 5:
-                    scroll_offset = max(-(content_height - screen.get_height()), scroll_offset - 20)
-            elif e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_ESCAPE:
-                    running = False
-            elif e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-        screen.fill(BG_COLOR)
-        y = 150 + scroll_offset
-        for line in ld["help_lines"]:
-            ls = font_small.render(line, True, BLACK)
-            screen.blit(ls, (50, y))
-            y += 40
-        esc = font_small.render(ld["press_esc_return"], True, BLACK)
-        screen.blit(esc, (50, screen.get_height()-50))
-        pygame.display.flip()
-        clock.tick(60)
+    # 帮助文字只渲染一次，滚动时只更新文字区域
+    run_widget(screen, ScrollView(screen, sys_font(24), lambda: ld["help_lines"], lambda: ld["press_esc_return"]))
+
+def draw_high_score_menu(screen, ld, scores, difficulty, font_big, font_small):
+    screen.fill(BG_COLOR)
+    title = f"{ld['high_score_label']} - {ld.get('difficulty_' + difficulty, difficulty)}"
+    t_surf = render_text(font_big, title, True, BLACK)
+    screen.blit(t_surf, t_surf.get_rect(center=(screen.get_width() // 2, 80)))
+    rows = scores.top(difficulty, LEADERBOARD_SIZE)
+    y = 140
+    if not rows:
+        screen.blit(render_text(font_small, ld["leaderboard_empty"], True, DARK_GRAY), (60, y))
+    for rank, (player, score, played_at) in enumerate(rows, 1):
+        date = time.strftime("%Y-%m-%d", time.localtime(played_at))
+        screen.blit(render_text(font_small, f"{rank}.", True, BLACK), (40, y))
+        screen.blit(render_text(font_small, player, True, BLACK), (90, y))
+        s_surf = render_text(font_small, str(score), True, BLACK)
+        screen.blit(s_surf, s_surf.get_rect(topright=(400, y)))
+        screen.blit(render_text(font_small, date, True, DARK_GRAY), (430, y))
+        y += 36
+    count = scores.count(difficulty)
+    if count:
+        # 中位数和前 10% 的分数线都由索引上的 OFFSET 查询得到，不用把整张表读出来
+        stats = (f"{ld.label('games_played_label')}{count}   "
+                 f"{ld.label('median_label')}{scores.score_at(difficulty, 50)}   "
+                 f"{ld.label('top_10_label')}{scores.score_at(difficulty, 90)}")
+        screen.blit(render_text(font_small, stats, True, BLUE), (40, 140 + LEADERBOARD_SIZE * 36 + 20))
+    hint = render_text(font_small, ld["leaderboard_hint"], True, BLACK)
+    screen.blit(hint, (40, screen.get_height() - 50))
 
-def show_high_score_menu(screen, ld):
+def show_high_score_menu(screen, ld, settings):
     font_big = sys_font(36)
     font_small = sys_font(24)
-    hs = load_high_score()
+    scores = get_scores(settings)
+    difficulties = list(settings["difficulty"])
+    current = settings.get("current_difficulty", "beginner")
+    idx = difficulties.index(current) if current in difficulties else 0
+    scheduler = FrameScheduler(60)
     running = True
+    dirty = True
     while running:
-        screen.fill(BG_COLOR)
-        txt = font_big.render(f"{ld['high_score_label']}: {hs}", True, BLACK)
-        screen.blit(txt, (150, 150))
-        esc = font_small.render(ld["press_esc_return"], True, BLACK)
-        screen.blit(esc, (150, 250))
-        pygame.display.flip()
-        for e in pygame.event.get():
+        # 画面是静态的，只在切换难度或窗口需要重画时才重画
+        if dirty:
+            draw_high_score_menu(screen, ld, scores, difficulties[idx], font_big, font_small)
+            pygame.display.flip()
+            dirty = False
+        for e in scheduler.wait():
             if e.type == pygame.QUIT:
                 pygame.quit(); sys.exit()
+            elif e.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE, TRANSLATIONS_READY):
+                dirty = True
             elif e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE:
                     running = False
+                elif e.key == pygame.K_LEFT:
+                    idx = (idx - 1) % len(difficulties)
+                    dirty = True
+                elif e.key == pygame.K_RIGHT:
+                    idx = (idx + 1) % len(difficulties)
+                    dirty = True
 
 # ------------------- 主菜单 -------------------
-def main():
-    os.makedirs(CONFIG_DIR, exist_ok=True)
-    os.makedirs(ASSETS_DIR, exist_ok=True)
-    settings = load_settings()
-    languages = load_languages()
-    default_lang = settings.get("default_language", "en")
-    ensure_language(languages, default_lang)
-    pygame.init()
+# ------------------- 启动 -------------------
+def start_music(settings):
     try:
         pygame.mixer.init()
         if os.path.exists(BGM_FILE):
@@ -934,22 +1003,71 @@ def main():
             if not settings["music_on"]:
                 pygame.mixer.music.pause()
     except Exception as e:
-        print("背景音乐加载失败：", e)
+        logging.warning(f"Failed to start background music: {e}")
+
+# 混音器在后台加载线程里初始化，之前（或初始化失败时）暂停/继续音乐什么也不做
+def pause_music():
+    if pygame.mixer.get_init():
+        pygame.mixer.music.pause()
+
+def resume_music():
+    if pygame.mixer.get_init():
+        pygame.mixer.music.unpause()
+
+def warm_game_modules(settings):
+    # 提前导入出题模块并建好当前难度的可解性索引，点开始游戏时不用再等
+    from formula_parser import SKELETONS
+    from puzzle_index import get_index
+    from puzzle_bank import load_bank
+    import game_state
+    cfg = settings["difficulty"].get(settings.get("current_difficulty", "beginner"))
+    if cfg:
+        get_index(SKELETONS, cfg)
+    load_bank(PUZZLE_BANK_FILE)
+
+def start_background_loading(settings):
+    # 第一帧只需要窗口和菜单字体，其余资源都在后台按顺序加载
+    loader = BackgroundLoader()
+    # 菜单用 180、游戏顶栏用 135 的 Logo，缩放结果缓存在 IMAGE_CACHE_DIR
+    ASSETS.cache_dir = IMAGE_CACHE_DIR
+    loader.add("logo", lambda: ASSETS.load_logo(LOGO_FILE, LOGO_SIZES))
+    loader.add("music", lambda: start_music(settings))
+    # 后台只读字体文件，Font 对象由主线程用到时再建（SDL_ttf 不保证线程安全）
+    loader.add("fonts", lambda: FONTS.preload())
+    loader.add("game_modules", lambda: warm_game_modules(settings))
+    STARTUP.background = loader.timings
+    loader.start()
+    return loader
+
+def main():
+    STARTUP.budget_ms = STARTUP_BUDGET_MS
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+    settings = load_settings()
+    default_lang = settings.get("default_language", "en")
+    my_lang_data = load_language(default_lang)
+    STARTUP.mark("config")
+    get_translator(settings.get("translation_backend"))
+    ensure_language({default_lang: my_lang_data}, default_lang)
+    STARTUP.mark("languages")
+    pygame.init()
+    if settings.get("profiling"):
+        # 开启后整段会话的分段计时在退出时写到 FRAME_TRACE_FILE
+        PROFILER.tracing = True
+        atexit.register(PROFILER.export, FRAME_TRACE_FILE)
+    FONTS.configure(settings)
+    STARTUP.mark("pygame_init")
     screen = pygame.display.set_mode((settings["window_width"], settings["window_height"]))
     pygame.display.set_caption("CalCraze -- your math tutor")
-    logo_surf = None
-    if os.path.exists(LOGO_FILE):
-        try:
-            tmp = pygame.image.load(LOGO_FILE)
-            logo_surf = pygame.transform.scale(tmp, (180, 180))
-        except:
-            logo_surf = None
-    my_lang_data = languages.get(default_lang, DEFAULT_LANGUAGES["en"])
+    STARTUP.mark("window")
+    start_background_loading(settings)
+    menu_font = sys_font(36)
+    STARTUP.mark("menu_font")
     while True:
         idx = run_vertical_menu(
-            screen, 80, logo_surf, sys_font(36),
-            my_lang_data["title_main_menu"],
-            [
+            screen, 80, lambda: ASSETS.logo(180), menu_font,
+            lambda: my_lang_data["title_main_menu"],
+            lambda: [
                 my_lang_data["menu_start"],
                 my_lang_data["menu_help"],
                 my_lang_data["menu_high_scores"],
@@ -964,9 +1082,11 @@ def main():
         elif idx == 1:
             show_help_menu(screen, my_lang_data)
         elif idx == 2:
-            show_high_score_menu(screen, my_lang_data)
+            show_high_score_menu(screen, my_lang_data, settings)
         elif idx == 3:
             break
+    logging.info(f"Text cache: {TEXT_CACHE.stats()}")
+    logging.info(f"Startup: {STARTUP.format()}")
     pygame.quit()
     sys.exit()
 
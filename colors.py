@@ -0,0 +1,13 @@
+# ------------------- 配色 -------------------
+# 游戏界面和菜单控件共用的颜色
+
+BLACK      = (0, 0, 0)
+WHITE      = (255, 255, 255)
+GRAY       = (200, 200, 200)
+LIGHT_GRAY = (230, 230, 230)
+GREEN      = (0, 200, 0)
+BLUE       = (100, 100, 255)
+RED        = (255, 0, 0)
+YELLOW     = (255, 255, 0)
+DARK_GRAY  = (50, 50, 50)
+BG_COLOR   = (240, 240, 240)
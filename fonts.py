@@ -0,0 +1,106 @@
+import io
+import logging
+import os
+import threading
+
+import pygame
+
+# ------------------- 字体注册表 -------------------
+# 每个 (字体文件, 字号) 只加载一次，整个进程共用。
+# 字体文件按语言从 settings["font_paths"] 选择，找不到时退回中文字体，再退回系统字体。
+# SDL_ttf 不保证多线程并发调用安全，Font 对象只在主线程里创建；
+# 后台线程只用 preload 把字体文件读进内存，主线程建 Font 时就不用再读盘。
+
+CJK_FONT = os.path.join("assets", "fonts", "jf-openhuninn-2.1.ttf")
+FALLBACK_SYSFONT = "PingFang TC"
+
+DEFAULT_FONT_PATHS = {
+    "en": os.path.join("assets", "fonts", "Roboto-Regular.ttf"),
+    "zh": CJK_FONT
+}
+
+
+class FontRegistry:
+    def __init__(self, font_paths=None, language="en"):
+        self.font_paths = dict(DEFAULT_FONT_PATHS)
+        if font_paths:
+            self.font_paths.update(font_paths)
+        self.language = language
+        self._fonts = {}
+        self._data = {}
+        self._missing = set()
+        self._lock = threading.RLock()
+
+    def configure(self, settings):
+        with self._lock:
+            self.font_paths.update(settings.get("font_paths", {}))
+            self.language = settings.get("default_language", self.language)
+
+    def set_language(self, language):
+        self.language = language
+
+    def candidates(self, language):
+        paths = []
+        for p in (self.font_paths.get(language), CJK_FONT):
+            if p and p not in paths:
+                paths.append(p)
+        return paths
+
+    def get(self, size, language=None):
+        language = language or self.language
+        for path in self.candidates(language):
+            font = self._load(path, size)
+            if font is not None:
+                return font
+        return self._load_sysfont(size)
+
+    def _load(self, path, size):
+        key = (path, size)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None or path in self._missing:
+                return font
+            data = self._data.get(path)
+            try:
+                font = pygame.font.Font(io.BytesIO(data) if data else path, size)
+            except Exception as e:
+                logging.warning(f"Failed to load font {path}: {e}")
+                self._missing.add(path)
+                return None
+            self._fonts[key] = font
+            return font
+
+    def _load_sysfont(self, size):
+        key = (FALLBACK_SYSFONT, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is None:
+                font = pygame.font.SysFont(FALLBACK_SYSFONT, size)
+                self._fonts[key] = font
+            return font
+
+    def warm(self, sizes, languages=None):
+        """加载常用字号；会创建 Font 对象，只能在主线程里调用。"""
+        for lang in languages or [self.language]:
+            for size in sizes:
+                self.get(size, lang)
+
+    def preload(self, languages=None):
+        """把各语言的字体文件读进内存，不碰 SDL_ttf，可以在后台线程里调用。"""
+        for lang in languages or [self.language]:
+            for path in self.candidates(lang):
+                if path in self._data:
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                with self._lock:
+                    self._data.setdefault(path, data)
+
+
+FONTS = FontRegistry()
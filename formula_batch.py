@@ -0,0 +1,91 @@
+import random
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，缺失时由调用方退回逐个生成
+    np = None
+
+from formula_parser import PLACEHOLDERS, compile_skeleton
+
+# ------------------- 批量公式生成 -------------------
+# 每个骨架一次抽取成千上万组候选数字，用 NumPy 整体求值，
+# 过滤掉除零与非整数结果后放入题池，之后逐个取用，题池空了再补一批。
+
+MIN_BATCH = 1024
+MAX_BATCH = 1 << 16
+TARGET_SURVIVORS = 256
+
+_POOL_CACHE = {}
+
+
+class _SkeletonPool:
+    def __init__(self, skeleton):
+        self.skeleton = skeleton
+        self.width = sum(1 for s in skeleton if s in PLACEHOLDERS)
+        self.fn = compile_skeleton(skeleton)
+        self.nums = None
+        self.values = None
+        self.cursor = 0
+        # 存活率的滑动估计，用来决定下一批抽多少组
+        self.survival = 1.0
+
+    def empty(self):
+        return self.values is None or self.cursor >= len(self.values)
+
+    def refill(self, rng, lo, hi):
+        size = int(TARGET_SURVIVORS / max(self.survival, 1e-6))
+        size = min(MAX_BATCH, max(MIN_BATCH, size))
+        cand = rng.integers(lo, hi + 1, size=(size, self.width))
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            vals = np.asarray(self.fn(*cand.T), dtype=np.float64)
+            rounded = np.round(vals)
+            mask = np.isfinite(vals) & (np.abs(vals - rounded) < 1e-9)
+        kept = int(mask.sum())
+        self.survival = 0.5 * self.survival + 0.5 * (kept / size)
+        self.nums = cand[mask]
+        self.values = rounded[mask].astype(np.int64)
+        self.cursor = 0
+        return kept > 0
+
+    def pop(self):
+        i = self.cursor
+        self.cursor += 1
+        return int(self.values[i]), tuple(int(n) for n in self.nums[i])
+
+
+class FormulaPool:
+    """按骨架分组的整数公式题池。"""
+
+    def __init__(self, skeletons, config, seed=None):
+        self.lo = config["min"]
+        self.hi = config["max"]
+        self.pools = [_SkeletonPool(sk) for sk in skeletons]
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.rng = np.random.default_rng(seed)
+
+    def draw(self):
+        """返回 (骨架, 整数结果, 数字组合)，骨架的选取与原先一样是均匀随机的。"""
+        while True:
+            pool = self.pools[int(self.rng.integers(len(self.pools)))]
+            if pool.empty() and not pool.refill(self.rng, self.lo, self.hi):
+                continue
+            val, nums = pool.pop()
+            return pool.skeleton, val, nums
+
+
+def get_pool(skeletons, config, seed=None):
+    """
+    取得缓存的题池；没有安装 numpy 时返回 None。
+    给出 seed 时返回一个新的、不缓存的题池，抽出的序列只由 seed 决定。
+    """
+    if np is None:
+        return None
+    if seed is not None:
+        return FormulaPool(skeletons, config, seed)
+    key = (tuple(tuple(sk) for sk in skeletons), config["min"], config["max"])
+    pool = _POOL_CACHE.get(key)
+    if pool is None:
+        pool = FormulaPool(skeletons, config)
+        _POOL_CACHE[key] = pool
+    return pool
@@ -1,5 +1,8 @@
 import ast
 import operator
+import re
+from fractions import Fraction
+from functools import lru_cache
 
 # 允许的运算符映射
 allowed_operators = {
@@ -9,30 +12,209 @@ allowed_operators = {
     ast.Div: operator.truediv
 }
 
-def safe_eval(expr: str) -> float:
+# 公式骨架：A, B, C, D 为占位符，按顺序由棋盘数字填入
+PLACEHOLDERS = ("A", "B", "C", "D")
+
+SKELETONS = [
+    ["A", "+", "B"],
+    ["A", "-", "B", "*", "C"],
+    ["(", "A", "+", "B", ")", "/", "C"],
+    ["A", "*", "B", "-", "C"],
+    ["(", "A", "-", "B", ")", "*", "C"],
+    ["A", "+", "B", "/", "C"]
+]
+
+# ------------------- 精确除法 -------------------
+def exact_div(a, b):
     """
-    使用 AST 安全解析表达式，只允许加、减、乘、除运算。
+    精确除法：整数能整除时返回 int，否则返回 Fraction，结果可以直接判断是否为整数。
     """
-    tree = ast.parse(expr, mode='eval')
-
-    def _eval(node):
-        if isinstance(node, ast.Expression):
-            return _eval(node.body)
-        # Python 3.8+ 使用 ast.Constant 表示数字
-        elif hasattr(ast, "Constant") and isinstance(node, ast.Constant):
-            return node.value
-        elif isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.BinOp):
-            op_type = type(node.op)
-            if op_type in allowed_operators:
-                left = _eval(node.left)
-                right = _eval(node.right)
-                if op_type == ast.Div and right == 0:
-                    raise ZeroDivisionError("Division by zero")
-                return allowed_operators[op_type](left, right)
-            else:
+    if type(a) is int and type(b) is int:
+        if b == 0:
+            raise ZeroDivisionError("Division by zero")
+        q, r = divmod(a, b)
+        if not r:
+            return q
+        return Fraction(a, b)
+    if isinstance(a, (int, Fraction)) and isinstance(b, (int, Fraction)):
+        if b == 0:
+            raise ZeroDivisionError("Division by zero")
+        res = Fraction(a) / b
+        return res.numerator if res.denominator == 1 else res
+    return a / b
+
+# ------------------- 表达式求值 -------------------
+# 表达式先按“形状”缓存：数字替换成 #，例如 "3+4*5" 与 "7+1*2" 共用 "#+#*#"。
+# 每种形状只用 AST 解析一次，转成后缀指令，之后用栈迭代求值。
+# 数字可以带指数部分，例如 1e5、2.5E-3
+_TOKEN_RE = re.compile(r"\s*(?:((?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)|(\S))")
+
+_PUSH, _NEG, _ADD, _SUB, _MUL, _DIV = range(6)
+
+_BINOP_CODES = {
+    ast.Add: _ADD,
+    ast.Sub: _SUB,
+    ast.Mult: _MUL,
+    ast.Div: _DIV
+}
+
+def _tokenize(expr):
+    shape = []
+    numbers = []
+    for num, other in _TOKEN_RE.findall(expr):
+        if num:
+            shape.append("#")
+            numbers.append(num)
+        elif other == "#":
+            raise ValueError("Unsupported expression")
+        else:
+            shape.append(other)
+    return "".join(shape), numbers
+
+@lru_cache(maxsize=4096)
+def _compile_shape(shape):
+    parts = []
+    slot = 0
+    for ch in shape:
+        if ch == "#":
+            parts.append(f"n{slot}")
+            slot += 1
+        else:
+            parts.append(ch)
+    body = ast.parse("".join(parts), mode="eval").body
+    program = []
+    stack = [(body, False)]
+    while stack:
+        node, visited = stack.pop()
+        if isinstance(node, ast.BinOp):
+            code = _BINOP_CODES.get(type(node.op))
+            if code is None:
                 raise ValueError("Unsupported operator")
+            if visited:
+                program.append((code, 0))
+            else:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            if visited:
+                if isinstance(node.op, ast.USub):
+                    program.append((_NEG, 0))
+            else:
+                stack.append((node, True))
+                stack.append((node.operand, False))
+        elif isinstance(node, ast.Name) and node.id[:1] == "n" and node.id[1:].isdigit():
+            program.append((_PUSH, int(node.id[1:])))
         else:
             raise ValueError("Unsupported expression")
-    return _eval(tree.body)
+    return tuple(program)
+
+def _run(program, values, exact):
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for code, arg in program:
+        if code == _PUSH:
+            push(values[arg])
+        elif code == _NEG:
+            stack[-1] = -stack[-1]
+        else:
+            b = pop()
+            a = stack[-1]
+            if code == _ADD:
+                stack[-1] = a + b
+            elif code == _SUB:
+                stack[-1] = a - b
+            elif code == _MUL:
+                stack[-1] = a * b
+            elif exact:
+                stack[-1] = exact_div(a, b)
+            else:
+                if b == 0:
+                    raise ZeroDivisionError("Division by zero")
+                stack[-1] = a / b
+    return stack[0]
+
+def safe_eval(expr: str, exact: bool = False):
+    """
+    安全求值表达式，只允许加、减、乘、除运算。
+    exact=True 时使用整数/Fraction 精确运算，整除的结果直接是 int。
+    """
+    shape, numbers = _tokenize(expr)
+    program = _compile_shape(shape)
+    if exact:
+        values = [int(n) if n.isdigit() else Fraction(n) for n in numbers]
+    else:
+        values = [int(n) if n.isdigit() else float(n) for n in numbers]
+    return _run(program, values, exact)
+
+# ------------------- 骨架编译 -------------------
+_COMPILED = {}
+
+def _check_node(node):
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in allowed_operators:
+            raise ValueError("Unsupported operator")
+        _check_node(node.left)
+        _check_node(node.right)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        _check_node(node.operand)
+    elif not isinstance(node, (ast.Name, ast.Constant)):
+        raise ValueError("Unsupported expression")
+
+class _ExactDivision(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.Call(func=ast.Name(id="_div", ctx=ast.Load()),
+                            args=[node.left, node.right], keywords=[])
+        return node
+
+def compile_skeleton(skeleton, exact=False):
+    """
+    把公式骨架编译成可直接调用的函数，例如 (A+B)/C -> lambda a0, a1, a2: (a0+a1)/a2。
+    参数按占位符出现的顺序传入，也可以传入 numpy 数组整体求值。
+    exact=True 时除法改用 exact_div，整数输入得到 int 或 Fraction。
+    """
+    key = (tuple(skeleton), exact)
+    fn = _COMPILED.get(key)
+    if fn is not None:
+        return fn
+    args = []
+    parts = []
+    for s in skeleton:
+        if s in PLACEHOLDERS:
+            name = f"a{len(args)}"
+            args.append(name)
+            parts.append(name)
+        else:
+            parts.append(s)
+    body = ast.parse("".join(parts), mode="eval").body
+    _check_node(body)
+    for node in ast.walk(body):
+        if isinstance(node, ast.Name) and node.id not in args:
+            raise ValueError(f"Unknown name: {node.id}")
+    if exact:
+        body = _ExactDivision().visit(body)
+    lam = ast.Expression(ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg=a) for a in args],
+                           kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body
+    ))
+    ast.fix_missing_locations(lam)
+    fn = eval(compile(lam, "<skeleton " + "".join(skeleton) + ">", "eval"),
+              {"__builtins__": None, "_div": exact_div})
+    _COMPILED[key] = fn
+    return fn
+
+def evaluate_skeleton(skeleton, nums, exact=False):
+    """用编译好的函数求值，除零时返回 None。"""
+    try:
+        return compile_skeleton(skeleton, exact)(*nums)
+    except ZeroDivisionError:
+        return None
+
+# 内置骨架在模块加载时就编译好
+for _sk in SKELETONS:
+    compile_skeleton(_sk)
+    compile_skeleton(_sk, exact=True)
@@ -0,0 +1,270 @@
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+
+import pygame
+
+# ------------------- 帧分段计时 -------------------
+# 每一帧从醒来处理事件开始，到画面推上屏幕结束（阻塞等待的时间不算在内）。
+# 帧内各阶段（事件、更新、记分板、棋盘、遮罩、flip 等）分别计时，
+# 最近若干帧保留在滚动窗口里，随时可以算 p50/p95/p99；
+# 打开 tracing 后每一段还会记成 Chrome trace 事件，结束时导出到文件，
+# 可以用 chrome://tracing 或 Perfetto 打开。
+
+DEFAULT_WINDOW = 300
+MAX_TRACE_EVENTS = 200000
+OVERLAY_REFRESH = 0.5
+# 导出的直方图分桶上限（毫秒）
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 33, 66, 133)
+
+PHASE_ABBREV = {
+    "event": "ev",
+    "update": "up",
+    "background": "bg",
+    "scoreboard": "sb",
+    "grid": "grid",
+    "overlay": "ov",
+    "draw": "draw",
+    "flip": "flip"
+}
+
+
+class _Phase:
+    """with 语句用的计时器，每个阶段名复用同一个对象。"""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+def percentile(sorted_values, q):
+    """最近秩法取分位数，sorted_values 需已排序。"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class FrameProfiler:
+    def __init__(self, window=DEFAULT_WINDOW, max_trace_events=MAX_TRACE_EVENTS):
+        self.window = window
+        self.tracing = False
+        self.overlay_visible = False
+        self._origin = time.perf_counter()
+        self._series = {}
+        self._phases = {}
+        self._trace = deque(maxlen=max_trace_events)
+        self._loop = None
+        self._frame_start = None
+        self._current = {}
+        self._discard = False
+        self._overlay = None
+        self._overlay_time = 0.0
+
+    # ---------- 采样 ----------
+    def begin_frame(self, loop):
+        """loop 是循环名（"game" / "menu"），不同循环分开统计。"""
+        self._loop = loop
+        self._frame_start = time.perf_counter()
+        self._current = {}
+        self._discard = False
+
+    def phase(self, name):
+        p = self._phases.get(name)
+        if p is None:
+            p = self._phases[name] = _Phase(self, name)
+        return p
+
+    def record(self, name, start, end):
+        if self._frame_start is None:
+            return
+        self._current[name] = self._current.get(name, 0.0) + (end - start)
+        if self.tracing:
+            self._trace_event(name, start, end)
+
+    def discard_frame(self):
+        """本帧里弹出了模态界面（菜单、结算画面），耗时没有参考价值，不计入统计。"""
+        self._discard = True
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        end = time.perf_counter()
+        if not self._discard:
+            self._push(self._loop, "frame", end - self._frame_start)
+            for name, dur in self._current.items():
+                self._push(self._loop, name, dur)
+            if self.tracing:
+                self._trace_event(self._loop, self._frame_start, end)
+        self._frame_start = None
+        self._current = {}
+
+    def _push(self, loop, name, seconds):
+        key = (loop, name)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = deque(maxlen=self.window)
+        series.append(seconds * 1000)
+
+    def _trace_event(self, name, start, end):
+        self._trace.append({
+            "name": name,
+            "cat": self._loop,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": 1,
+            "tid": 1
+        })
+
+    # ---------- 统计 ----------
+    def percentiles(self, loop, name="frame"):
+        """返回最近窗口内的 p50/p95/p99（毫秒）。"""
+        values = sorted(self._series.get((loop, name), ()))
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "count": len(values)
+        }
+
+    def phases(self, loop):
+        return [name for (l, name) in self._series if l == loop and name != "frame"]
+
+    def histogram(self, loop, name="frame"):
+        counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        for v in self._series.get((loop, name), ()):
+            i = 0
+            while i < len(HISTOGRAM_BUCKETS) and v > HISTOGRAM_BUCKETS[i]:
+                i += 1
+            counts[i] += 1
+        return counts
+
+    def summary(self):
+        out = {}
+        for loop, name in self._series:
+            entry = out.setdefault(loop, {})
+            entry[name] = self.percentiles(loop, name)
+        for loop in out:
+            out[loop]["histogram_ms"] = {
+                "buckets": list(HISTOGRAM_BUCKETS),
+                "counts": self.histogram(loop)
+            }
+        return out
+
+    def export(self, path):
+        """写出 Chrome trace 格式的 JSON，统计摘要放在 metadata 里。"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": list(self._trace),
+                "displayTimeUnit": "ms",
+                "metadata": {"summary": self.summary()}
+            }, f)
+        return path
+
+    # ---------- 叠加层 ----------
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self._overlay = None
+        return self.overlay_visible
+
+    def overlay_surface(self, font, loop, budget_ms):
+        # 文字每隔半秒才刷新一次；直接 font.render，不占用共享的文字缓存
+        now = time.perf_counter()
+        if self._overlay is not None and now - self._overlay_time < OVERLAY_REFRESH:
+            return self._overlay
+        f = self.percentiles(loop)
+        lines = [
+            f"frame p50 {f['p50']:.2f} p95 {f['p95']:.2f} p99 {f['p99']:.2f}",
+            f"budget {budget_ms:.1f} ms  n={f['count']}"
+        ]
+        parts = [f"{PHASE_ABBREV.get(n, n)} {self.percentiles(loop, n)['p95']:.2f}" for n in self.phases(loop)]
+        for i in range(0, len(parts), 4):
+            lines.append(("p95 " if i == 0 else "") + "  ".join(parts[i:i + 4]))
+        color = (255, 80, 80) if f["p95"] > budget_ms > 0 else (255, 255, 255)
+        rendered = [font.render(line, True, color if i == 0 else (255, 255, 255)) for i, line in enumerate(lines)]
+        w = max(s.get_width() for s in rendered) + 8
+        h = sum(s.get_height() for s in rendered) + 6
+        surf = pygame.Surface((w, h))
+        surf.fill((40, 40, 40))
+        y = 3
+        for s in rendered:
+            surf.blit(s, (4, y))
+            y += s.get_height()
+        self._overlay = surf
+        self._overlay_time = now
+        return surf
+
+
+PROFILER = FrameProfiler()
+
+
+# ------------------- 启动计时 -------------------
+class StartupTimer:
+    """按顺序记录启动的各个阶段，mark 记下从上一个标记到现在的耗时（毫秒）。"""
+
+    def __init__(self, budget_ms=None):
+        self.budget_ms = budget_ms
+        self.origin = time.perf_counter()
+        self._last = self.origin
+        self.marks = []
+        # 后台线程里并行完成的阶段，不计入第一帧
+        self.background = {}
+        self.first_frame_ms = None
+
+    def restart(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self._last = self.origin
+        self.marks = []
+        self.first_frame_ms = None
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.marks.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def frame_shown(self):
+        """第一帧推上屏幕后调用，只有第一次有效。"""
+        if self.first_frame_ms is not None:
+            return
+        self.mark("first_frame")
+        self.first_frame_ms = (self._last - self.origin) * 1000
+        logging.info(f"Startup: {self.format()}")
+        if self.budget_ms and self.first_frame_ms > self.budget_ms:
+            logging.warning(f"First frame took {self.first_frame_ms:.0f} ms, budget is {self.budget_ms} ms")
+
+    def report(self):
+        return {
+            "marks": dict(self.marks),
+            "first_frame_ms": self.first_frame_ms,
+            "background": dict(self.background)
+        }
+
+    def format(self):
+        parts = [f"{name} {ms:.1f}" for name, ms in self.marks]
+        text = " | ".join(parts) + " ms"
+        if self.first_frame_ms is not None:
+            text += f" (first frame at {self.first_frame_ms:.1f} ms)"
+        if self.background:
+            text += "; background: " + ", ".join(f"{k} {v:.1f}" for k, v in self.background.items())
+        return text
+
+
+STARTUP = StartupTimer()
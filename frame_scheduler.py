@@ -0,0 +1,43 @@
+import math
+
+import pygame
+
+# ------------------- 事件驱动的帧调度 -------------------
+# 界面静止时阻塞在 pygame.event.wait 上，不再按固定帧率空转。
+# 只有三种情况会醒来：有输入事件、到了下一个需要重画的时间点（例如计时器跳秒）、
+# 或者有动画正在播放（此时按帧率醒来）。
+
+# 没有任何截止时间时最多睡这么久，醒来空转一次几乎不占 CPU
+MAX_IDLE_MS = 5000
+
+
+class FrameScheduler:
+    def __init__(self, fps=60, max_idle_ms=MAX_IDLE_MS):
+        self.fps = fps
+        self.max_idle_ms = max_idle_ms
+        self.clock = pygame.time.Clock()
+
+    def frame_ms(self):
+        return max(1, int(1000 / self.fps)) if self.fps else 1
+
+    def timeout_ms(self, animating=False, deadline=None):
+        """animating 为真时按帧率醒来；否则等到 deadline 秒之后（None 表示只等输入）。"""
+        if animating:
+            return self.frame_ms()
+        if deadline is None:
+            return self.max_idle_ms
+        # 向上取整再多等 1 毫秒，保证醒来时已经越过截止时间
+        return max(1, min(self.max_idle_ms, int(math.ceil(deadline * 1000)) + 1))
+
+    def wait(self, animating=False, deadline=None):
+        """阻塞到有事件或超时，返回这期间收到的全部事件。"""
+        first = pygame.event.wait(self.timeout_ms(animating, deadline))
+        events = [] if first.type == pygame.NOEVENT else [first]
+        events.extend(pygame.event.get())
+        # 只用来记录两次醒来的间隔（动画按它推进），不在这里限速
+        self.clock.tick()
+        return events
+
+    def elapsed(self):
+        """上一次 wait 到这一次 wait 之间的秒数。"""
+        return self.clock.get_time() / 1000
@@ -0,0 +1,208 @@
+import random
+import time
+from array import array
+
+from formula_batch import get_pool
+from formula_parser import SKELETONS, PLACEHOLDERS, evaluate_skeleton
+from puzzle_index import get_index
+
+# ------------------- 游戏规则核心 -------------------
+# 不依赖 pygame 的回合状态机：分数、回合、选格、判定与超时都在这里，
+# 时钟和随机数可以注入，方便无界面地批量模拟与测试。
+
+CORRECT_POINTS = 10
+WRONG_PENALTY = 5
+TIMEOUT_PENALTY = 5
+
+
+# ------------------- 生成整数公式 -------------------
+def generate_integer_formula(skeletons, config, rng=None, pool=None):
+    """
+    pool 和 rng 都不给时用进程共享的题池；给了 rng 而没有 pool 时逐个抽取，
+    结果只由 rng 决定。
+    """
+    if pool is None and rng is None:
+        pool = get_pool(skeletons, config)
+    if pool is not None:
+        sk, val, _ = pool.draw()
+        return sk, val
+    # 没有 numpy 时退回逐个抽取
+    rng = rng or random
+    while True:
+        sk = rng.choice(skeletons)
+        placeholders = [s for s in sk if s in PLACEHOLDERS]
+        rcount = len(placeholders)
+        nums = [rng.randint(config["min"], config["max"]) for _ in range(rcount)]
+        val = evaluate_skeleton(sk, nums, exact=True)
+        if type(val) is int:
+            return sk, val
+
+
+class GameState:
+    def __init__(self, settings, high_score=0, clock=time.time, rng=None, bank=None):
+        self.settings = settings
+        self.clock = clock
+        self.rng = rng if rng is not None else random.Random()
+        self.bank = bank
+        # 本局自己的批量题池，种子取自 self.rng，第一次用到时才建；
+        # 没有 numpy 时记为 False，种子在两种环境下都只取一次
+        self._pool = None
+        self.difficulty = settings.get("current_difficulty", "beginner")
+        self.config = settings["difficulty"][self.difficulty]
+        self.grid_size = settings["grid_size"]
+        self.total_rounds = self.config.get("rounds", 7)
+        self.time_limit = self.config.get("time_limit", 30)
+        self.high_score = high_score
+        self.score = 0
+        self.current_round = 1
+        self.paused = False
+        self.finished = False
+        self.selected = []
+        # 与 selected 同步的逐格选中标记，按下标 O(1) 查询
+        self.selected_mask = bytearray()
+        # 每开一局新回合加一，界面据此判断棋盘是否换了
+        self.round_id = 0
+        self.grid_numbers = array("l")
+        self.skeleton = []
+        self.placeholder_count = 0
+        self.target_value = 0
+        # 最近一次判定结果："correct" / "wrong" / "timeout"
+        self.feedback = ""
+        self.feedback_time = 0
+        self.start_time = self.clock()
+        self.new_round()
+
+    # ---------- 回合 ----------
+    def new_round(self):
+        # 优先从离线题库按难度抽题，没有题库时从可解性索引抽题，保证棋盘上一定能凑出目标值
+        cell_count = self.grid_size * self.grid_size
+        planted = None
+        if self.bank and self.bank.grid_size == self.grid_size:
+            planted = self.bank.draw(self.difficulty, self.rng)
+        if not planted:
+            planted = get_index(SKELETONS, self.config).plant(cell_count, self.rng)
+        if planted:
+            sk, val, cells = planted
+        else:
+            sk, val = generate_integer_formula(SKELETONS, self.config, self.rng, self.formula_pool())
+            cells = [self.rng.randint(self.config["min"], self.config["max"]) for _ in range(cell_count)]
+        # 棋盘数字平铺存成整数数组，下标 = 行 * grid_size + 列
+        self.grid_numbers = array("l", cells)
+        self.skeleton = sk
+        self.target_value = val
+        self.placeholder_count = sum(1 for s in sk if s in PLACEHOLDERS)
+        self.selected = []
+        self.selected_mask = bytearray(cell_count)
+        self.round_id += 1
+        self.start_time = self.clock()
+
+    def formula_pool(self):
+        """没有 numpy 时返回 None，由 generate_integer_formula 用 self.rng 逐个抽取。"""
+        if self._pool is None:
+            self._pool = get_pool(SKELETONS, self.config, seed=self.rng.getrandbits(64)) or False
+        return self._pool or None
+
+    def reset(self):
+        self.score = 0
+        self.current_round = 1
+        self.paused = False
+        self.finished = False
+        self.feedback = ""
+        self.feedback_time = 0
+        self.new_round()
+
+    def toggle_pause(self):
+        if self.paused:
+            self.paused = False
+            self.start_time = self.clock()
+        else:
+            self.paused = True
+
+    def _finish_round(self, result, delta):
+        self.score += delta
+        self.feedback = result
+        self.feedback_time = self.clock()
+        self.clear_selection()
+        self.current_round += 1
+        if self.current_round > self.total_rounds:
+            self.finished = True
+        else:
+            self.new_round()
+        return result
+
+    # ---------- 选格 ----------
+    def select(self, index):
+        """切换一格的选中状态，新选中时返回 True。"""
+        if self.selected_mask[index]:
+            self.selected.remove(index)
+            self.selected_mask[index] = 0
+        elif len(self.selected) < self.placeholder_count:
+            self.selected.append(index)
+            self.selected_mask[index] = 1
+            return True
+        return False
+
+    def is_selected(self, index):
+        return self.selected_mask[index] == 1
+
+    def undo(self):
+        if self.selected:
+            index = self.selected.pop()
+            self.selected_mask[index] = 0
+            return index
+        return None
+
+    def clear_selection(self):
+        for i in self.selected:
+            self.selected_mask[i] = 0
+        self.selected = []
+
+    def selected_numbers(self):
+        return [self.grid_numbers[i] for i in self.selected]
+
+    # ---------- 判定 ----------
+    def submit(self):
+        """数字未填满时返回 None，否则结束本回合并返回判定结果。"""
+        if self.finished or len(self.selected) < self.placeholder_count:
+            return None
+        res = evaluate_skeleton(self.skeleton, self.selected_numbers(), exact=True)
+        if res is not None and res == self.target_value:
+            return self._finish_round("correct", CORRECT_POINTS)
+        return self._finish_round("wrong", -WRONG_PENALTY)
+
+    def remaining_time(self):
+        elapsed = 0 if self.paused else self.clock() - self.start_time
+        return max(0, int(self.time_limit - elapsed))
+
+    def seconds_until_tick(self):
+        """距离剩余秒数下一次变化（或超时）还有多久，暂停或已结束时返回 None。"""
+        if self.finished or self.paused:
+            return None
+        left = self.time_limit - (self.clock() - self.start_time)
+        if left <= 0:
+            return 0
+        # 显示的是 int(left)，left 降到下一个整数时数字就会变
+        return left - int(left)
+
+    def tick(self):
+        """推进计时，超时则结束本回合并返回 "timeout"。"""
+        if self.finished or self.paused:
+            return None
+        if self.clock() - self.start_time > self.time_limit:
+            return self._finish_round("timeout", -TIMEOUT_PENALTY)
+        return None
+
+    # ---------- 显示辅助 ----------
+    def formula_text(self):
+        res = []
+        idx = 0
+        for token in self.skeleton:
+            if token in PLACEHOLDERS:
+                if idx < len(self.selected):
+                    res.append(str(self.grid_numbers[self.selected[idx]]))
+                else:
+                    res.append("?")
+                idx += 1
+            else:
+                res.append(token)
+        return " ".join(res)
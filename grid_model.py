@@ -0,0 +1,53 @@
+import pygame
+
+# ------------------- 棋盘几何 -------------------
+# 棋盘是规则的方格，格子位置全部由下标算出，不再为每一格保存对象和 Rect。
+# 点击命中、邻格查找都是整数运算，与棋盘大小无关；grid_size 从 4 到 64 以上都一样。
+
+
+def fit_cell_size(grid_size, cell_size, width, height):
+    """棋盘放不下时缩小格子，保证整个棋盘落在 width x height 之内（至少 4 像素）。"""
+    if grid_size <= 0:
+        return cell_size
+    return max(4, min(cell_size, width // grid_size, height // grid_size))
+
+
+class GridModel:
+    def __init__(self, grid_size, cell_size, origin):
+        self.size = grid_size
+        self.cell_size = cell_size
+        self.ox, self.oy = origin
+        self.count = grid_size * grid_size
+
+    def bounds(self):
+        side = self.size * self.cell_size
+        return pygame.Rect(self.ox, self.oy, side, side)
+
+    def row_col(self, index):
+        return divmod(index, self.size)
+
+    def rect(self, index):
+        r, c = divmod(index, self.size)
+        cs = self.cell_size
+        return pygame.Rect(self.ox + c * cs, self.oy + r * cs, cs, cs)
+
+    def index_at(self, pos):
+        """返回坐标所在格子的下标，不在棋盘上时返回 None。"""
+        x = pos[0] - self.ox
+        y = pos[1] - self.oy
+        if x < 0 or y < 0:
+            return None
+        c = x // self.cell_size
+        r = y // self.cell_size
+        if c >= self.size or r >= self.size:
+            return None
+        return r * self.size + c
+
+    def neighbors(self, index):
+        """包括自身在内的 3x3 邻格下标。"""
+        r, c = divmod(index, self.size)
+        n = self.size
+        for rr in range(max(0, r - 1), min(n, r + 2)):
+            base = rr * n
+            for cc in range(max(0, c - 1), min(n, c + 2)):
+                yield base + cc
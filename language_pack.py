@@ -0,0 +1,145 @@
+import json
+import logging
+import marshal
+import os
+from types import MappingProxyType
+
+from settings_store import atomic_write
+
+# ------------------- 语言包缓存 -------------------
+# languages.json 只在修改时间或大小变化时才重新解析：解析结果编译成 marshal 格式的
+# 缓存文件，下次启动直接读缓存；同一进程里再次读取时连文件都不打开，只做一次 os.stat。
+# 编译好的语言包是只读的，界面用的是从它复制出来的 StringTable。
+
+CACHE_VERSION = 1
+
+
+class StringTable(dict):
+    """
+    一种语言的界面文字。仍然是 dict，后台翻译可以直接写回；
+    "标签: " 这样的前缀按键缓存，文字被改写时对应的前缀随之失效。
+    """
+
+    __slots__ = ("lang", "_labels")
+
+    def __init__(self, lang, strings=()):
+        super().__init__(strings)
+        self.lang = lang
+        self._labels = {}
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._labels.pop(key, None)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._labels.clear()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def reset(self, lang, strings):
+        """原地换成另一种语言，持有这个表的界面不用换引用。"""
+        super().clear()
+        super().update(strings)
+        self.lang = lang
+        self._labels.clear()
+
+    def label(self, key):
+        """返回 "文字: "，例如 label("score_label") -> "Score: "。"""
+        s = self._labels.get(key)
+        if s is None:
+            s = self._labels[key] = f"{self[key]}: "
+        return s
+
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+def compile_packs(raw):
+    """{语言: {键: 文字}} -> 可以 marshal 的只含 str/tuple 的字典。"""
+    return {lang: {k: _freeze(v) for k, v in strings.items()}
+            for lang, strings in raw.items() if isinstance(strings, dict)}
+
+
+class LanguagePacks:
+    def __init__(self, path, cache_path, defaults):
+        self.path = path
+        self.cache_path = cache_path
+        self.defaults = defaults
+        self._stamp = None
+        self._packs = {}
+        # 统计：parse 是解析 JSON 的次数，cache 是读缓存文件的次数
+        self.parses = 0
+        self.cache_loads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def packs(self):
+        """返回 {语言: 只读语言包}；JSON 没变时直接用内存里的结果。"""
+        stamp = self._file_stamp()
+        if stamp is None:
+            self._write_defaults()
+            stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return self._packs
+        packs = self._read_cache(stamp)
+        if packs is None:
+            packs = self._compile(stamp)
+        self._packs = {lang: MappingProxyType(strings) for lang, strings in packs.items()}
+        self._stamp = stamp
+        return self._packs
+
+    def table(self, lang):
+        """给界面用的 StringTable；语言包里没有这种语言时返回空表，由自动翻译补齐。"""
+        return StringTable(lang, self.packs().get(lang, {}))
+
+    def _write_defaults(self):
+        try:
+            atomic_write(self.path, json.dumps(self.defaults, ensure_ascii=False, indent=4))
+        except OSError as e:
+            logging.warning(f"Failed to write {self.path}: {e}")
+
+    def _read_cache(self, stamp):
+        if stamp is None or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "rb") as f:
+                version, cached_stamp, packs = marshal.load(f)
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            logging.warning(f"Ignoring language cache {self.cache_path}: {e}")
+            return None
+        if version != CACHE_VERSION or tuple(cached_stamp) != stamp:
+            return None
+        self.cache_loads += 1
+        return packs
+
+    def _compile(self, stamp):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to read {self.path}: {e}")
+            return compile_packs(self.defaults)
+        self.parses += 1
+        packs = compile_packs(raw)
+        if stamp is not None:
+            folder = os.path.dirname(self.cache_path) or "."
+            try:
+                os.makedirs(folder, exist_ok=True)
+                data = marshal.dumps((CACHE_VERSION, stamp, packs))
+                tmp = self.cache_path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self.cache_path)
+            except OSError as e:
+                logging.warning(f"Failed to write language cache {self.cache_path}: {e}")
+        return packs
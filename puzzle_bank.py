@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import math
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from formula_parser import SKELETONS
+from puzzle_index import get_index
+from solver import count_solutions
+
+# ------------------- 题目难度评分 -------------------
+# 离线批量生成 (棋盘, 骨架, 目标值) 并按解的数量、运算符组合和数字大小打分。
+# 每个难度配置单独生成候选题，只放进与它同名的一档，题目的数字范围与游戏里该难度一致。
+# 分数决定一道题留不留：每档先用前 CALIBRATION_SIZE 道候选题估计本难度的分数分布，
+# 由易到难的各档依次保留分布里更靠后的一段（最易一档保留最低的 TIER_BAND，最难一档保留最高的 TIER_BAND），
+# 分数段和保留下来的题的分数分布都记在元数据里。
+#
+# 题库文件格式（小端）：
+#   文件头  magic "CCPB" | 版本 u16 | 棋盘边长 u16 | 元数据长度 u32 | 记录起始偏移 u64
+#   元数据  JSON：骨架表、各档 (名称, 起始记录, 记录数, 数字范围, 分数分布)
+#   记录    骨架编号 u16 | 目标值 i32 | 棋盘数字 i16 * 边长²，定长紧密排列，同一档的记录连续存放
+#           （记录本身不补齐，只有记录区的起始偏移按 RECORD_ALIGN 对齐）
+# 游戏用 mmap 打开，按下标直接定位记录，不需要把文件读进内存。
+
+OP_WEIGHTS = {"+": 1.0, "-": 1.5, "*": 2.0, "/": 3.0, "(": 0.5}
+SOLUTION_WEIGHT = 6.0
+MAGNITUDE_WEIGHT = 2.0
+
+CHUNK_SIZE = 2000
+# 每档先用这么多候选题估计分数分布，得出本档保留的分数段
+CALIBRATION_SIZE = 20000
+# 每档保留的分位区间宽度
+TIER_BAND = 0.4
+
+BANK_MAGIC = b"CCPB"
+BANK_VERSION = 4
+HEADER = struct.Struct("<4sHHIQ")
+RECORD_ALIGN = 64
+
+# 记录里各字段的取值范围
+CELL_RANGE = (-(1 << 15), (1 << 15) - 1)
+TARGET_RANGE = (-(1 << 31), (1 << 31) - 1)
+
+_BANK_CACHE = {}
+
+
+def record_struct(grid_size):
+    return struct.Struct(f"<Hi{grid_size * grid_size}h")
+
+
+def rate_puzzle(grid, skeleton, target, solutions=None):
+    """分数越高越难：解越少、运算越复杂、数字越大，分数越高。"""
+    if solutions is None:
+        solutions = count_solutions(grid, skeleton, target)
+    if solutions == 0:
+        return None
+    score = SOLUTION_WEIGHT / (1 + math.log2(solutions))
+    score += sum(OP_WEIGHTS.get(s, 0) for s in skeleton)
+    nums = [n for row in grid for n in row]
+    magnitude = max(abs(target), sum(abs(n) for n in nums) / len(nums))
+    score += MAGNITUDE_WEIGHT * math.log10(1 + magnitude)
+    return score
+
+
+def _generate_chunk(args):
+    seed, count, config, grid_size = args
+    rng = random.Random(seed)
+    ids = {tuple(sk): i for i, sk in enumerate(SKELETONS)}
+    index = get_index(SKELETONS, config)
+    cell_count = grid_size * grid_size
+    record = record_struct(grid_size)
+    out = []
+    if not index:
+        return out
+    for _ in range(count):
+        planted = index.plant(cell_count, rng)
+        if planted is None:
+            continue
+        sk, target, cells = planted
+        if not TARGET_RANGE[0] <= target <= TARGET_RANGE[1]:
+            continue
+        grid = [cells[r * grid_size:(r + 1) * grid_size] for r in range(grid_size)]
+        score = rate_puzzle(grid, sk, target)
+        if score is not None:
+            out.append((score, record.pack(ids[tuple(sk)], target, *cells)))
+    return out
+
+
+def validate_configs(settings):
+    """检查各难度的数字范围能否存进定长记录，不能时抛出 ValueError。"""
+    errors = []
+    for name, cfg in settings["difficulty"].items():
+        lo, hi = cfg["min"], cfg["max"]
+        if lo > hi:
+            errors.append(f"{name}: min {lo} > max {hi}")
+        if lo < CELL_RANGE[0] or hi > CELL_RANGE[1]:
+            errors.append(f"{name}: numbers must be within {CELL_RANGE[0]}..{CELL_RANGE[1]}")
+        for key in ("target_min", "target_max"):
+            t = cfg.get(key)
+            if t is not None and not TARGET_RANGE[0] <= t <= TARGET_RANGE[1]:
+                errors.append(f"{name}: {key} must be within {TARGET_RANGE[0]}..{TARGET_RANGE[1]}")
+    if errors:
+        raise ValueError("; ".join(errors))
+
+
+class _TierSink:
+    """
+    一档题目的去处：只收分数落在本档分数段内的题。分数段由前 CALIBRATION_SIZE 道候选题的
+    分位数 quantiles=(低, 高) 得出，校准之前的候选题先缓存，校准后再按分数段过滤。
+    per_tier 为 None 时全部写进临时文件，否则在内存里做蓄水池抽样，最多保留 per_tier 条。
+    """
+
+    def __init__(self, capacity, rng, tmp_dir, quantiles=(0.0, 1.0)):
+        self.capacity = capacity
+        self.rng = rng
+        self.quantiles = quantiles
+        # 分数段 [低, 高]，None 表示这一端不设限；校准之前 band 为 None
+        self.band = None
+        self.calibration = []
+        self.candidates = 0
+        self.seen = 0
+        self.items = []
+        # 分数分布：最低、总和、最高
+        self.score_min = None
+        self.score_max = None
+        self.score_sum = 0.0
+        self.spill = None if capacity else tempfile.TemporaryFile(dir=tmp_dir)
+
+    def add(self, score, rec):
+        self.candidates += 1
+        if self.band is None:
+            self.calibration.append((score, rec))
+            if len(self.calibration) >= CALIBRATION_SIZE:
+                self.calibrate()
+            return
+        lo, hi = self.band
+        if (lo is not None and score < lo) or (hi is not None and score > hi):
+            return
+        self._keep(score, rec)
+
+    def calibrate(self):
+        """按已缓存的候选题定下分数段，再把它们按分数段过滤一遍。"""
+        if self.band is not None:
+            return
+        scores = sorted(score for score, _ in self.calibration)
+        q_lo, q_hi = self.quantiles
+        lo = scores[int(q_lo * (len(scores) - 1))] if scores and q_lo > 0 else None
+        hi = scores[int(q_hi * (len(scores) - 1))] if scores and q_hi < 1 else None
+        self.band = (lo, hi)
+        pending, self.calibration = self.calibration, []
+        for score, rec in pending:
+            if (lo is None or score >= lo) and (hi is None or score <= hi):
+                self._keep(score, rec)
+
+    def _keep(self, score, rec):
+        self.seen += 1
+        self.score_sum += score
+        if self.score_min is None or score < self.score_min:
+            self.score_min = score
+        if self.score_max is None or score > self.score_max:
+            self.score_max = score
+        if self.spill is not None:
+            self.spill.write(rec)
+        elif len(self.items) < self.capacity:
+            self.items.append(rec)
+        else:
+            j = self.rng.randrange(self.seen)
+            if j < self.capacity:
+                self.items[j] = rec
+
+    def __len__(self):
+        return self.seen if self.spill is not None else len(self.items)
+
+    def scores(self):
+        if not self.seen:
+            return None
+        return [round(self.score_min, 3), round(self.score_sum / self.seen, 3), round(self.score_max, 3)]
+
+    def copy_to(self, f):
+        if self.spill is None:
+            f.write(b"".join(self.items))
+            return
+        self.spill.seek(0)
+        while True:
+            buf = self.spill.read(1 << 20)
+            if not buf:
+                break
+            f.write(buf)
+        self.spill.close()
+
+
+def tier_quantiles(t, n, width=TIER_BAND):
+    """n 档中第 t 档（由易到难）保留的分位区间，例如三档时为 (0, 0.4)、(0.3, 0.7)、(0.6, 1)。"""
+    if n <= 1:
+        return (0.0, 1.0)
+    lo = t * (1 - width) / (n - 1)
+    return (lo, min(1.0, lo + width))
+
+
+def build_bank(settings, count, out_path, per_tier=None, workers=None, seed=None):
+    """
+    用所有 CPU 核心生成 count 道候选题（各难度平分），打分后写成二进制题库。
+    档位名称与 settings["difficulty"] 的键一致，按声明顺序由易到难，每档只含该难度配置生成、
+    且分数落在本档分数段内的题；per_tier 不为 None 时每档最多保留 per_tier 道。
+    种子相同时输出的文件逐字节相同。返回各档题目数量。
+    """
+    validate_configs(settings)
+    tiers = list(settings["difficulty"].keys())
+    configs = list(settings["difficulty"].values())
+    grid_size = settings["grid_size"]
+    if seed is None:
+        seed = random.getrandbits(32)
+    rng = random.Random(seed)
+    jobs = []
+    chunk_id = 0
+    for t, cfg in enumerate(configs):
+        left = count // len(configs) + (1 if t < count % len(configs) else 0)
+        while left > 0:
+            n = min(CHUNK_SIZE, left)
+            jobs.append((t, (seed + chunk_id, n, cfg, grid_size)))
+            left -= n
+            chunk_id += 1
+
+    out_dir = os.path.dirname(out_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    sinks = [_TierSink(per_tier, rng, out_dir, tier_quantiles(t, len(tiers))) for t in range(len(tiers))]
+
+    # imap 按提交顺序返回结果，蓄水池抽样的随机数消耗顺序与进程调度无关
+    with Pool(processes=workers or os.cpu_count()) as pool:
+        chunks = pool.imap(_generate_chunk, [job for _, job in jobs])
+        for (t, _), chunk in zip(jobs, chunks):
+            for score, rec in chunk:
+                sinks[t].add(score, rec)
+    # 候选题不足 CALIBRATION_SIZE 的档位用已有的全部候选题校准
+    for sink in sinks:
+        sink.calibrate()
+
+    tier_table = []
+    start = 0
+    for name, cfg, sink in zip(tiers, configs, sinks):
+        tier_table.append({"name": name, "start": start, "count": len(sink),
+                           "min": cfg["min"], "max": cfg["max"], "band": list(sink.band),
+                           "candidates": sink.candidates, "scores": sink.scores()})
+        start += len(sink)
+    meta = json.dumps({
+        "skeletons": SKELETONS,
+        "tiers": tier_table
+    }, ensure_ascii=False).encode("utf-8")
+    data_offset = HEADER.size + len(meta)
+    data_offset += -data_offset % RECORD_ALIGN
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(BANK_MAGIC, BANK_VERSION, grid_size, len(meta), data_offset))
+        f.write(meta)
+        f.write(b"\0" * (data_offset - HEADER.size - len(meta)))
+        for sink in sinks:
+            sink.copy_to(f)
+    os.replace(tmp_path, out_path)
+    return {t["name"]: t["count"] for t in tier_table}
+
+
+# ------------------- 题库读取 -------------------
+class PuzzleBank:
+    """通过 mmap 随机访问的定长记录题库。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        magic, version, grid_size, meta_len, data_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != BANK_MAGIC or version != BANK_VERSION:
+            self.close()
+            raise ValueError(f"Not a puzzle bank (v{BANK_VERSION}): {path}")
+        meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_len].decode("utf-8"))
+        self.grid_size = grid_size
+        self.data_offset = data_offset
+        self.record = record_struct(grid_size)
+        self.skeletons = meta["skeletons"]
+        self.tiers = {t["name"]: (t["start"], t["count"]) for t in meta["tiers"]}
+        # 各档的数字范围 (min, max) 与分数段 [低, 高]（None 表示不设限）
+        self.ranges = {t["name"]: (t["min"], t["max"]) for t in meta["tiers"]}
+        self.bands = {t["name"]: tuple(t["band"]) for t in meta["tiers"]}
+        self.total = sum(count for _, count in self.tiers.values())
+
+    def __len__(self):
+        return self.total
+
+    def record_at(self, i):
+        """返回第 i 条记录 (骨架编号, 目标值, 棋盘数字元组)。"""
+        fields = self.record.unpack_from(self._mm, self.data_offset + i * self.record.size)
+        return fields[0], fields[1], fields[2:]
+
+    def draw(self, tier, rng=random):
+        """返回 (骨架, 目标值, 平铺的棋盘数字)，没有该档题目时返回 None。"""
+        start, count = self.tiers.get(tier, (0, 0))
+        if not count:
+            return None
+        sid, target, cells = self.record_at(start + rng.randrange(count))
+        return self.skeletons[sid], target, list(cells)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def verify_bank(path, sample=1000, full=False, rng=random):
+    """检查文件结构，并抽查（或全部检查）记录是否可解、数字与分数是否在本档范围内。返回问题列表。"""
+    errors = []
+    try:
+        bank = PuzzleBank(path)
+    except (OSError, ValueError, struct.error) as e:
+        return [str(e)]
+    try:
+        expected = bank.data_offset + bank.total * bank.record.size
+        actual = os.path.getsize(path)
+        if actual != expected:
+            errors.append(f"File size {actual} != expected {expected}")
+            return errors
+        pos = 0
+        for name, (start, count) in bank.tiers.items():
+            if start != pos:
+                errors.append(f"Tier {name} starts at {start}, expected {pos}")
+            pos = start + count
+        if full:
+            indices = range(bank.total)
+        else:
+            indices = [rng.randrange(bank.total) for _ in range(min(sample, bank.total))]
+        gs = bank.grid_size
+        spans = [(start, start + count, name, bank.ranges[name], bank.bands[name])
+                 for name, (start, count) in bank.tiers.items()]
+        for i in indices:
+            sid, target, cells = bank.record_at(i)
+            if sid >= len(bank.skeletons):
+                errors.append(f"Record {i}: bad skeleton id {sid}")
+                continue
+            grid = [cells[r * gs:(r + 1) * gs] for r in range(gs)]
+            score = rate_puzzle(grid, bank.skeletons[sid], target)
+            if score is None:
+                errors.append(f"Record {i}: unsolvable")
+            for start, end, name, (lo, hi), (s_lo, s_hi) in spans:
+                if start <= i < end:
+                    if not all(lo <= n <= hi for n in cells):
+                        errors.append(f"Record {i}: numbers outside {name} range {lo}..{hi}")
+                    if score is not None and ((s_lo is not None and score < s_lo) or (s_hi is not None and score > s_hi)):
+                        errors.append(f"Record {i}: score {score:.3f} outside {name} band")
+                    break
+    finally:
+        bank.close()
+    return errors
+
+
+def load_bank(path):
+    """打开题库，文件不存在或格式不对时返回 None；同一路径只打开一次。"""
+    if path in _BANK_CACHE:
+        return _BANK_CACHE[path]
+    bank = None
+    if os.path.exists(path):
+        try:
+            bank = PuzzleBank(path)
+        except (OSError, ValueError, KeyError, struct.error):
+            bank = None
+    _BANK_CACHE[path] = bank
+    return bank
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify a CalCraze puzzle bank.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="generate, rate and write a tiered bank")
+    build.add_argument("--settings", default=os.path.join("config", "settings.json"))
+    build.add_argument("--out", default=os.path.join("config", "puzzle_bank.bin"))
+    build.add_argument("--count", type=int, default=200000, help="number of candidate puzzles")
+    build.add_argument("--per-tier", type=int, default=None, help="keep at most this many puzzles per tier")
+    build.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    build.add_argument("--seed", type=int, default=None)
+    verify = sub.add_parser("verify", help="check a bank file")
+    verify.add_argument("path", nargs="?", default=os.path.join("config", "puzzle_bank.bin"))
+    verify.add_argument("--sample", type=int, default=1000, help="records to re-solve")
+    verify.add_argument("--full", action="store_true", help="re-solve every record")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        start = time.time()
+        try:
+            counts = build_bank(settings, args.count, args.out, args.per_tier, args.workers, args.seed)
+        except ValueError as e:
+            print(f"Invalid difficulty settings: {e}", file=sys.stderr)
+            return 1
+        elapsed = time.time() - start
+        print(f"Rated {args.count} candidates in {elapsed:.1f}s ({args.count / max(elapsed, 1e-9):.0f}/s)")
+        for name, n in counts.items():
+            print(f"  {name}: {n} puzzles")
+        return 0
+
+    errors = verify_bank(args.path, args.sample, args.full)
+    for e in errors[:20]:
+        print(e)
+    if errors:
+        print(f"{len(errors)} problem(s) found in {args.path}")
+        return 1
+    print(f"{args.path}: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import itertools
+import random
+from array import array
+
+from formula_parser import PLACEHOLDERS, compile_skeleton
+
+# ------------------- 可解性索引 -------------------
+# 对每个难度配置预先枚举所有数字组合，记录 (骨架, 目标值) -> 全部可行组合。
+# 组合按目标值排序后平铺进一个紧凑数组，目标值只保存起点与数量，
+# 抽题时随机选骨架、目标值和组合都是 O(1)。
+
+_INDEX_CACHE = {}
+
+
+def _typecode(lo, hi):
+    if -32768 <= lo and hi <= 32767:
+        return "h"
+    return "l"
+
+
+class SkeletonIndex:
+    """单个骨架在某个数字范围下的全部整数解。"""
+
+    def __init__(self, skeleton, width, typecode):
+        self.skeleton = skeleton
+        self.width = width
+        self.numbers = array(typecode)
+        self.targets = []
+        self.spans = {}
+
+    def add_target(self, target, tuples):
+        start = len(self.numbers) // self.width
+        for t in tuples:
+            self.numbers.extend(t)
+        self.targets.append(target)
+        self.spans[target] = (start, len(tuples))
+
+    def tuple_at(self, i):
+        off = i * self.width
+        return tuple(self.numbers[off:off + self.width])
+
+    def solutions(self, target):
+        start, count = self.spans.get(target, (0, 0))
+        return [self.tuple_at(start + i) for i in range(count)]
+
+    def sample(self, rng=random):
+        target = rng.choice(self.targets)
+        start, count = self.spans[target]
+        return target, self.tuple_at(start + rng.randrange(count))
+
+
+class SolvabilityIndex:
+    """一个难度配置下所有骨架的索引，只保存至少有一个解的骨架。"""
+
+    def __init__(self, skeletons, config):
+        self.config = config
+        self.entries = []
+        lo, hi = config["min"], config["max"]
+        t_lo = config.get("target_min")
+        t_hi = config.get("target_max")
+        code = _typecode(lo, hi)
+        for sk in skeletons:
+            names = [s for s in sk if s in PLACEHOLDERS]
+            fn = compile_skeleton(sk, exact=True)
+            by_target = {}
+            for nums in itertools.product(range(lo, hi + 1), repeat=len(names)):
+                try:
+                    val = fn(*nums)
+                except ZeroDivisionError:
+                    continue
+                if type(val) is not int:
+                    continue
+                if (t_lo is not None and val < t_lo) or (t_hi is not None and val > t_hi):
+                    continue
+                by_target.setdefault(val, []).append(nums)
+            if not by_target:
+                continue
+            entry = SkeletonIndex(sk, len(names), code)
+            for target in sorted(by_target):
+                entry.add_target(target, by_target[target])
+            self.entries.append(entry)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def sample(self, rng=random):
+        entry = rng.choice(self.entries)
+        target, nums = entry.sample(rng)
+        return entry.skeleton, target, nums
+
+    def plant(self, cell_count, rng=random):
+        """
+        抽取一题并生成棋盘：把一组可行数字放到随机格子，其余格子随机填充。
+        返回 (骨架, 目标值, 平铺的棋盘数字)，无法放下时返回 None。
+        """
+        if not self.entries:
+            return None
+        sk, target, nums = self.sample(rng)
+        if len(nums) > cell_count:
+            return None
+        lo, hi = self.config["min"], self.config["max"]
+        cells = [rng.randint(lo, hi) for _ in range(cell_count)]
+        for pos, n in zip(rng.sample(range(cell_count), len(nums)), nums):
+            cells[pos] = n
+        return sk, target, cells
+
+
+def get_index(skeletons, config):
+    key = (
+        tuple(tuple(sk) for sk in skeletons),
+        config["min"], config["max"],
+        config.get("target_min"), config.get("target_max")
+    )
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        index = SolvabilityIndex(skeletons, config)
+        _INDEX_CACHE[key] = index
+    return index
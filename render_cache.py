@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+# ------------------- 文字渲染缓存 -------------------
+# font.render 的结果按 (字体, 文字, 抗锯齿, 颜色) 缓存，超出容量时淘汰最久未用的。
+# 返回的 Surface 是共享的，调用方不要直接修改（需要 set_alpha 等操作时先 copy）。
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+class TextCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, tuple(color))
+        surf = self._entries.get(key)
+        if surf is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self._entries[key] = surf
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return surf
+
+    def clear(self):
+        self._entries.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate()
+        }
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, antialias, color):
+    """代替 font.render，所有界面文字都走这里。"""
+    return TEXT_CACHE.render(font, text, antialias, color)
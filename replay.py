@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+
+# ------------------- 录像回放 -------------------
+# 在无窗口（SDL dummy 驱动）下按录像重放一局：不等真实时间，每条输入之后画一帧，
+# 结束时把对局校验值与录像比较。录像既能复现问题，也能当作固定的性能测试负载。
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import session_log
+from frame_profiler import PROFILER
+from language_pack import StringTable
+from session_log import ReplayClock, load_session
+
+
+def replay_session(data, draw=True):
+    """重放一局，返回 (是否与录像一致, 统计信息)。"""
+    import calcraze
+    settings = dict(data["settings"], record_sessions=False)
+    if data.get("bank") != session_log.bank_fingerprint(calcraze.PUZZLE_BANK_FILE):
+        print("warning: puzzle bank differs from the recording, rounds may not match", file=sys.stderr)
+    if not pygame.display.get_init():
+        pygame.init()
+    screen = pygame.display.set_mode((settings["window_width"], settings["window_height"]))
+    ld = StringTable("en", calcraze.DEFAULT_LANGUAGES["en"])
+    clock = ReplayClock()
+    game = calcraze.FormulaFillGame(screen, settings, ld, "en", seed=data["seed"], clock=clock, interactive=False)
+    actions = {
+        session_log.SELECT: game.handle_click_cell,
+        session_log.SUBMIT: game.evaluate_formula,
+        session_log.UNDO: game.undo,
+        session_log.TIMEOUT: game.update_timer,
+        session_log.PAUSE: game.toggle_pause,
+        session_log.RESET: game.reset_game
+    }
+    frames = 0
+    start = time.perf_counter()
+    for event in data["events"]:
+        clock.set(event[0])
+        PROFILER.begin_frame("replay")
+        with PROFILER.phase("update"):
+            actions[event[1]](*event[2:])
+        if draw:
+            game.draw()
+            frames += 1
+        PROFILER.end_frame()
+    elapsed = time.perf_counter() - start
+    expected = data.get("result") or {}
+    ok = expected.get("fingerprint") in (None, session_log.fingerprint(game.state))
+    stats = {
+        "events": len(data["events"]),
+        "frames": frames,
+        "seconds": elapsed,
+        "score": game.state.score,
+        "expected_score": expected.get("score"),
+        "frame_ms": PROFILER.percentiles("replay")
+    }
+    return ok, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded CalCraze sessions headlessly.")
+    parser.add_argument("sessions", nargs="+", help="session files written with \"record_sessions\": true")
+    parser.add_argument("--repeat", type=int, default=1, help="replay each session this many times")
+    parser.add_argument("--no-draw", action="store_true", help="only run the game state, skip rendering")
+    args = parser.parse_args(argv)
+    failed = 0
+    for path in args.sessions:
+        data = load_session(path)
+        for _ in range(args.repeat):
+            ok, stats = replay_session(data, draw=not args.no_draw)
+            p = stats["frame_ms"]
+            print(f"{path}: {'OK' if ok else 'MISMATCH'} score {stats['score']} (recorded {stats['expected_score']}), "
+                  f"{stats['events']} events in {stats['seconds'] * 1000:.1f} ms "
+                  f"({stats['events'] / max(stats['seconds'], 1e-9):.0f}/s), "
+                  f"frame p50 {p['p50']:.3f} ms p95 {p['p95']:.3f} ms")
+            if not ok:
+                failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import logging
+import os
+import sqlite3
+import time
+
+# ------------------- 成绩库 -------------------
+# 每局结束记一条 (玩家, 难度, 分数, 回合数, 时间)，存在本地 SQLite 里。
+# (难度, 分数) 上建了索引：排行榜取前 N 名、按分数算百分位都只走索引，
+# 几十万条记录也是毫秒级。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_score ON games (difficulty, score DESC, played_at);
+CREATE INDEX IF NOT EXISTS games_by_player ON games (player, difficulty, score DESC);
+"""
+
+
+class ScoreStore:
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        # WAL 下每局一次的提交不用等整库同步，界面不会因此卡顿
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- 写入 ----------
+    def record(self, player, difficulty, score, rounds, played_at=None):
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO games (player, difficulty, score, rounds, played_at) VALUES (?, ?, ?, ?, ?)",
+                (player, difficulty, score, rounds, played_at if played_at is not None else time.time()))
+        return cur.lastrowid
+
+    def record_many(self, rows):
+        """rows 是 (玩家, 难度, 分数, 回合数, 时间) 的序列，批量导入时用。"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO games (player, difficulty, score, rounds, played_at) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def import_legacy(self, path, player, difficulty):
+        """把旧版 highscore.dat 里的单个最高分导入一次（库为空时）。"""
+        if not os.path.exists(path) or self.count() > 0:
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                score = int(f.read().strip())
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to import {path}: {e}")
+            return False
+        self.record(player, difficulty, score, 0, os.path.getmtime(path))
+        return True
+
+    # ---------- 查询 ----------
+    def count(self, difficulty=None):
+        if difficulty is None:
+            return self.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM games WHERE difficulty = ?", (difficulty,)).fetchone()[0]
+
+    def best(self, difficulty, player=None):
+        if player is None:
+            row = self.conn.execute(
+                "SELECT score FROM games WHERE difficulty = ? ORDER BY score DESC LIMIT 1", (difficulty,)).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT score FROM games WHERE player = ? AND difficulty = ? ORDER BY score DESC LIMIT 1",
+                (player, difficulty)).fetchone()
+        return row[0] if row else 0
+
+    def top(self, difficulty, n=10, player=None):
+        """返回 [(玩家, 分数, 时间)]，分数相同时先达到的排前面。"""
+        if player is None:
+            return self.conn.execute(
+                "SELECT player, score, played_at FROM games WHERE difficulty = ? "
+                "ORDER BY score DESC, played_at LIMIT ?", (difficulty, n)).fetchall()
+        return self.conn.execute(
+            "SELECT player, score, played_at FROM games WHERE player = ? AND difficulty = ? "
+            "ORDER BY score DESC, played_at LIMIT ?", (player, difficulty, n)).fetchall()
+
+    def rank(self, difficulty, score):
+        """score 的名次（比它高的局数 + 1）。"""
+        higher = self.conn.execute(
+            "SELECT COUNT(*) FROM games WHERE difficulty = ? AND score > ?", (difficulty, score)).fetchone()[0]
+        return higher + 1
+
+    def percentile_of(self, difficulty, score):
+        """低于 score 的局数占比（0~100），没有记录时返回 None。"""
+        total = self.count(difficulty)
+        if not total:
+            return None
+        lower = self.conn.execute(
+            "SELECT COUNT(*) FROM games WHERE difficulty = ? AND score < ?", (difficulty, score)).fetchone()[0]
+        return 100.0 * lower / total
+
+    def score_at(self, difficulty, pct):
+        """第 pct 百分位的分数（最近秩法），没有记录时返回 None。"""
+        total = self.count(difficulty)
+        if not total:
+            return None
+        k = max(0, min(total - 1, -(-pct * total // 100) - 1))
+        row = self.conn.execute(
+            "SELECT score FROM games WHERE difficulty = ? ORDER BY score LIMIT 1 OFFSET ?",
+            (difficulty, int(k))).fetchone()
+        return row[0] if row else None
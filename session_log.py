@@ -0,0 +1,167 @@
+import json
+import os
+import random
+import time
+import zlib
+from contextlib import contextmanager
+
+# ------------------- 对局录像 -------------------
+# 一局游戏只由三样东西决定：随机数种子、设置和改变 GameState 的输入。
+# 录制时 GameState 用的时钟是“从开局算起的整微秒”，每次输入处理期间把时钟冻结，
+# 状态机在这次输入里读到的时间和写进录像的时间完全一致；
+# 回放时用同一个种子、按录像里的时间逐条重放，就能得到一模一样的对局。
+#
+# 录像格式（JSON）：
+#   {"version": 1, "seed": 种子, "settings": {...}, "bank": 题库指纹,
+#    "events": [[微秒, 代码, 参数?], ...], "result": {...}}
+# 代码：s=选格(下标) e=提交 u=撤销 t=超时 p=暂停/继续 r=重新开始
+
+LOG_VERSION = 1
+
+SELECT = "s"
+SUBMIT = "e"
+UNDO = "u"
+TIMEOUT = "t"
+PAUSE = "p"
+RESET = "r"
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(32)
+
+
+class SessionClock:
+    """录制用的时钟：返回开局以来的秒数，精确到整微秒；held() 块内时间不动。"""
+
+    def __init__(self, base=time.perf_counter):
+        self.base = base
+        self.t0 = base()
+        self._held = None
+
+    def restart(self):
+        """把开局时刻重新定为现在。"""
+        self.t0 = self.base()
+
+    def micros(self):
+        if self._held is not None:
+            return self._held
+        return int((self.base() - self.t0) * 1_000_000)
+
+    def __call__(self):
+        return self.micros() / 1_000_000
+
+    @contextmanager
+    def held(self, micros=None):
+        """块内时间停在进入时（或给定的 micros）。"""
+        outer = self._held
+        self._held = self.micros() if micros is None else micros
+        try:
+            yield self._held
+        finally:
+            self._held = outer
+
+
+class ReplayClock(SessionClock):
+    """回放用的时钟：时间只由 set() 推进。"""
+
+    def __init__(self):
+        self._held = None
+        self.now = 0
+
+    def restart(self):
+        self.now = 0
+
+    def set(self, micros):
+        self.now = micros
+
+    def micros(self):
+        return self.now
+
+
+def fingerprint(state):
+    """对局状态的校验值，回放结束时与录像里的比较。"""
+    data = repr((state.score, state.current_round, state.round_id, state.finished,
+                 state.target_value, list(state.grid_numbers), state.selected))
+    return zlib.crc32(data.encode("utf-8"))
+
+
+_BANK_FINGERPRINTS = {}
+
+
+def bank_fingerprint(path):
+    """
+    题库整个文件（文件头、元数据和记录）的 CRC32，文件不存在时为 None。
+    记录是定长的，同样条数的两个题库大小相同，只能按内容区分；
+    同一文件的结果按修改时间和大小缓存。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _BANK_FINGERPRINTS.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    crc = 0
+    try:
+        with open(path, "rb") as f:
+            while True:
+                buf = f.read(1 << 20)
+                if not buf:
+                    break
+                crc = zlib.crc32(buf, crc)
+    except OSError:
+        return None
+    _BANK_FINGERPRINTS[path] = (stamp, crc)
+    return crc
+
+
+class SessionRecorder:
+    def __init__(self, seed, settings, clock, bank=None):
+        self.seed = seed
+        self.settings = settings
+        self.clock = clock
+        self.bank = bank
+        self.events = []
+        self.result = None
+
+    def log(self, code, arg=None):
+        t = self.clock.micros()
+        self.events.append([t, code] if arg is None else [t, code, arg])
+
+    def finish(self, state):
+        self.result = {
+            "score": state.score,
+            "rounds": state.current_round,
+            "finished": state.finished,
+            "fingerprint": fingerprint(state)
+        }
+
+    def to_dict(self):
+        return {
+            "version": LOG_VERSION,
+            "seed": self.seed,
+            "settings": self.settings,
+            "bank": self.bank,
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "events": self.events,
+            "result": self.result
+        }
+
+    def save(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        return path
+
+
+def load_session(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != LOG_VERSION:
+        raise ValueError(f"{path}: unsupported session version {data.get('version')!r}")
+    return data
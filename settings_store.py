@@ -0,0 +1,149 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+
+# ------------------- 设置存储 -------------------
+# 设置放在内存里，保存时先在调用线程里序列化成快照，与磁盘上的内容相同就跳过；
+# 不同则交给后台写线程，等一小段时间把连续几次修改合并成一次写入。
+# 写入先写同目录下的临时文件再 os.replace，中途崩溃也不会留下写了一半的文件。
+
+DEFAULT_DELAY = 0.5
+
+
+def atomic_write(path, text):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class SettingsStore:
+    def __init__(self, path, defaults, delay=DEFAULT_DELAY):
+        self.path = path
+        self.defaults = defaults
+        self.delay = delay
+        self.writes = 0
+        self._cond = threading.Condition()
+        # 磁盘上（或即将写到磁盘上）的内容，用来判断是否需要写
+        self._written = None
+        self._pending = None
+        self._seq = 0
+        self._seq_on_disk = 0
+        # 已经写完（成功或失败）的最大编号，flush 等它追上 _seq
+        self._seq_done = 0
+        self._io_lock = threading.Lock()
+        self._thread = None
+        self._atexit = False
+
+    @staticmethod
+    def serialize(data):
+        return json.dumps(data, ensure_ascii=False, indent=4)
+
+    def load(self, fill=None):
+        """读取设置；fill(dict) 可以补上缺的键。只有内容确实变化（或文件不存在、损坏）时才会写回。"""
+        data = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                with self._cond:
+                    self._written = self.serialize(data)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Failed to read {self.path}: {e}")
+        if data is None:
+            data = copy.deepcopy(self.defaults)
+        if fill:
+            fill(data)
+        self.save(data)
+        return data
+
+    def save(self, data):
+        """返回是否真的安排了一次写入。"""
+        text = self.serialize(data)
+        with self._cond:
+            if text == (self._pending if self._pending is not None else self._written):
+                return False
+            self._pending = text
+            self._cond.notify()
+            self._ensure_writer()
+        return True
+
+    def flush(self):
+        """立即写出还没写的修改，并等写线程手上正在写的那次写完（退出时调用）。"""
+        with self._cond:
+            job = self._take()
+            seq = self._seq
+        if job:
+            self._write(*job)
+        with self._cond:
+            while self._seq_done < seq:
+                self._cond.wait()
+
+    def _take(self):
+        # 调用方持有 self._cond；取出待写内容并编号，之后可以在锁外写盘
+        text, self._pending = self._pending, None
+        if text is None:
+            return None
+        self._written = text
+        self._seq += 1
+        return self._seq, text
+
+    def _ensure_writer(self):
+        # 调用方持有 self._cond；写线程空闲一段时间会自己退出，退出前会把 _thread 清空
+        if not self._atexit:
+            atexit.register(self.flush)
+            self._atexit = True
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    if not self._cond.wait(timeout=5) and self._pending is None:
+                        self._thread = None
+                        return
+                # 等到 delay 秒内没有新的修改再写，连续的修改只写最后一次
+                text = self._pending
+                while True:
+                    self._cond.wait(timeout=self.delay)
+                    if self._pending is text or self._pending is None:
+                        break
+                    text = self._pending
+                job = self._take()
+            if job:
+                self._write(*job)
+
+    def _write(self, seq, text):
+        # 写盘在锁外进行，save 不会被磁盘 I/O 卡住；编号保证旧内容不会覆盖新内容
+        with self._io_lock:
+            try:
+                if seq > self._seq_on_disk:
+                    atomic_write(self.path, text)
+                    self._seq_on_disk = seq
+                    self.writes += 1
+            except OSError as e:
+                logging.warning(f"Failed to save {self.path}: {e}")
+                with self._cond:
+                    if self._written is text:
+                        self._written = None
+            finally:
+                with self._cond:
+                    self._seq_done = max(self._seq_done, seq)
+                    self._cond.notify_all()
@@ -0,0 +1,163 @@
+from fractions import Fraction
+from itertools import permutations, product
+from math import perm
+
+from formula_parser import PLACEHOLDERS, compile_skeleton
+
+# ------------------- 棋盘求解 -------------------
+# 找出所有能让公式等于目标值的有序选格方式。
+# 1. 相同数字的格子合并成一组，只枚举不同数字的组合，最后再展开成具体格子；
+# 2. 只枚举前 k-1 个占位符，最后一个占位符不枚举：
+#    固定前缀后公式对最后一个数 x 是分式线性函数 (a*x + b) / (c*x + d)，
+#    直接解方程得到唯一候选（或“任意 x”），再用精确求值复核。
+
+
+class _Mobius:
+    """表示 (a*x + b) / (c*x + d)，只支持与普通数字的四则运算。"""
+
+    __slots__ = ("a", "b", "c", "d")
+
+    def __init__(self, a, b, c, d):
+        self.a, self.b, self.c, self.d = a, b, c, d
+
+    def __add__(self, s):
+        return _Mobius(self.a + s * self.c, self.b + s * self.d, self.c, self.d)
+
+    __radd__ = __add__
+
+    def __sub__(self, s):
+        return _Mobius(self.a - s * self.c, self.b - s * self.d, self.c, self.d)
+
+    def __rsub__(self, s):
+        return _Mobius(s * self.c - self.a, s * self.d - self.b, self.c, self.d)
+
+    def __mul__(self, s):
+        return _Mobius(self.a * s, self.b * s, self.c, self.d)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, s):
+        if s == 0:
+            raise ZeroDivisionError("Division by zero")
+        return _Mobius(self.a, self.b, self.c * s, self.d * s)
+
+    def __rtruediv__(self, s):
+        return _Mobius(s * self.c, s * self.d, self.a, self.b)
+
+    def __neg__(self):
+        return _Mobius(-self.a, -self.b, self.c, self.d)
+
+    def __pos__(self):
+        return self
+
+
+_X = _Mobius(1, 0, 0, 1)
+
+
+def _flatten(grid):
+    positions = {}
+    for r, row in enumerate(grid):
+        for c, n in enumerate(row):
+            positions.setdefault(n, []).append((r, c))
+    return positions
+
+
+def _value_solutions(counts, skeleton, target):
+    """按数字（而不是格子）枚举所有解，每个数字的使用次数不超过它在棋盘上的个数。"""
+    k = sum(1 for s in skeleton if s in PLACEHOLDERS)
+    if k == 0:
+        return
+    fn = compile_skeleton(skeleton, exact=True)
+    values = sorted(counts)
+    prefix = []
+
+    def check(nums):
+        try:
+            return fn(*nums) == target
+        except ZeroDivisionError:
+            return False
+
+    def last_slot():
+        try:
+            m = fn(*prefix, _X)
+        except ZeroDivisionError:
+            return
+        coef = m.a - target * m.c
+        rhs = target * m.d - m.b
+        if coef != 0:
+            if type(coef) is int and type(rhs) is int:
+                x, r = divmod(rhs, coef)
+                if r:
+                    return
+            else:
+                x = Fraction(rhs) / coef
+                if x.denominator != 1:
+                    return
+                x = x.numerator
+            candidates = [x]
+        elif rhs == 0:
+            candidates = values
+        else:
+            return
+        for x in candidates:
+            if counts.get(x, 0) > 0 and check(prefix + [x]):
+                yield tuple(prefix) + (x,)
+
+    def walk(depth):
+        if depth == k - 1:
+            yield from last_slot()
+            return
+        for v in values:
+            if counts[v] == 0:
+                continue
+            counts[v] -= 1
+            prefix.append(v)
+            yield from walk(depth + 1)
+            prefix.pop()
+            counts[v] += 1
+
+    yield from walk(0)
+
+
+def _expand(nums, positions):
+    slots = {}
+    for i, v in enumerate(nums):
+        slots.setdefault(v, []).append(i)
+    groups = list(slots.items())
+    choices = [permutations(positions[v], len(idx)) for v, idx in groups]
+    for picked in product(*choices):
+        sel = [None] * len(nums)
+        for (v, idx), cells in zip(groups, picked):
+            for i, cell in zip(idx, cells):
+                sel[i] = cell
+        yield tuple(sel)
+
+
+def iter_solutions(grid, skeleton, target):
+    """逐个产生解，每个解是按占位符顺序排列的 (row, col) 元组。"""
+    positions = _flatten(grid)
+    counts = {v: len(p) for v, p in positions.items()}
+    for nums in _value_solutions(counts, skeleton, target):
+        yield from _expand(nums, positions)
+
+
+def solve(grid, skeleton, target):
+    """返回棋盘上所有能让 skeleton 等于 target 的有序选格方式。"""
+    return list(iter_solutions(grid, skeleton, target))
+
+
+def count_solutions(grid, skeleton, target):
+    """只计数不展开：每组数字的选法数是各数字格子数的排列数之积。"""
+    positions = _flatten(grid)
+    counts = {v: len(p) for v, p in positions.items()}
+    total = 0
+    for nums in _value_solutions(counts, skeleton, target):
+        ways = 1
+        for v in set(nums):
+            ways *= perm(len(positions[v]), nums.count(v))
+        total += ways
+    return total
+
+
+def first_solution(grid, skeleton, target):
+    return next(iter_solutions(grid, skeleton, target), None)
@@ -0,0 +1,23 @@
+from fractions import Fraction
+
+import pytest
+
+from formula_parser import safe_eval
+
+
+@pytest.mark.parametrize("expr", ["1e5", "2.5E-3*4", "1e5/4", "3e+2-1", ".5e1", "(1.5e1+5)/4", "-2e2*3"])
+def test_scientific_notation_matches_python(expr):
+    assert safe_eval(expr) == pytest.approx(eval(expr))
+    assert float(safe_eval(expr, exact=True)) == pytest.approx(eval(expr))
+
+
+def test_exact_mode_keeps_exponents_exact():
+    assert safe_eval("1e5", exact=True) == 100000
+    assert safe_eval("2.5E-3*4", exact=True) == Fraction(1, 100)
+    assert safe_eval("1e5/3", exact=True) == Fraction(100000, 3)
+
+
+@pytest.mark.parametrize("expr", ["2e", "1e5e3", "abs(1)", "2**3", "1#2"])
+def test_rejects_unsupported_expressions(expr):
+    with pytest.raises(ValueError):
+        safe_eval(expr)
@@ -0,0 +1,45 @@
+import random
+
+import formula_batch
+import game_state
+from game_state import GameState
+
+SETTINGS = {
+    "grid_size": 4,
+    "current_difficulty": "beginner",
+    "difficulty": {"beginner": {"min": 1, "max": 9, "rounds": 7, "time_limit": 30}}
+}
+
+
+class _NoIndex:
+    def plant(self, cell_count, rng):
+        return None
+
+
+def _fallback_state(monkeypatch, seed, numpy):
+    # 让每一回合都走 generate_integer_formula 的退路
+    monkeypatch.setattr(game_state, "get_index", lambda skeletons, config: _NoIndex())
+    if not numpy:
+        monkeypatch.setattr(formula_batch, "np", None)
+    return GameState(SETTINGS, clock=lambda: 0.0, rng=random.Random(seed))
+
+
+def _rounds(state, n=6):
+    out = []
+    for _ in range(n):
+        out.append((tuple(state.skeleton), state.target_value, tuple(state.grid_numbers)))
+        state.new_round()
+    return out
+
+
+def test_fallback_is_reproducible_from_rng(monkeypatch):
+    assert _rounds(_fallback_state(monkeypatch, 3, True)) == _rounds(_fallback_state(monkeypatch, 3, True))
+
+
+def test_pool_seed_drawn_once_without_numpy(monkeypatch):
+    state = _fallback_state(monkeypatch, 5, False)
+    assert state.formula_pool() is None
+    before = state.rng.getstate()
+    assert state.formula_pool() is None
+    assert state.rng.getstate() == before
+    assert _rounds(state) == _rounds(_fallback_state(monkeypatch, 5, False))
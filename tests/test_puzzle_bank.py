@@ -0,0 +1,68 @@
+import copy
+
+import pytest
+
+import puzzle_bank
+from puzzle_bank import PuzzleBank, build_bank, rate_puzzle, verify_bank
+
+SETTINGS = {
+    "grid_size": 4,
+    "difficulty": {
+        "beginner":     {"min": 1, "max": 9,  "target_min": 5,  "target_max": 20},
+        "intermediate": {"min": 1, "max": 15, "target_min": 10, "target_max": 50},
+        "advanced":     {"min": 1, "max": 20, "target_min": 20, "target_max": 100}
+    }
+}
+
+
+@pytest.fixture
+def bank_path(tmp_path, monkeypatch):
+    # 校准样本调小，覆盖“先缓存、校准后再过滤”和校准之后直接过滤两条路径
+    monkeypatch.setattr(puzzle_bank, "CALIBRATION_SIZE", 200)
+    path = str(tmp_path / "bank.bin")
+    build_bank(SETTINGS, 1500, path, workers=2, seed=11)
+    return path
+
+
+def test_tier_scores_stay_in_band(bank_path):
+    bank = PuzzleBank(bank_path)
+    try:
+        means = []
+        for name, (start, count) in bank.tiers.items():
+            assert count > 0
+            lo, hi = bank.bands[name]
+            n_lo, n_hi = bank.ranges[name]
+            scores = []
+            for i in range(start, start + count):
+                sid, target, cells = bank.record_at(i)
+                grid = [cells[r * 4:(r + 1) * 4] for r in range(4)]
+                score = rate_puzzle(grid, bank.skeletons[sid], target)
+                assert score is not None
+                assert lo is None or score >= lo
+                assert hi is None or score <= hi
+                assert all(n_lo <= n <= n_hi for n in cells)
+                scores.append(score)
+            means.append(sum(scores) / len(scores))
+        # 由易到难的档位，平均分数依次升高
+        assert means == sorted(means)
+        # 最易一档只限上限，最难一档只限下限
+        bands = list(bank.bands.values())
+        assert bands[0][0] is None and bands[0][1] is not None
+        assert bands[-1][0] is not None and bands[-1][1] is None
+    finally:
+        bank.close()
+    assert verify_bank(bank_path, full=True) == []
+
+
+def test_same_seed_same_file(bank_path, tmp_path):
+    other = str(tmp_path / "again.bin")
+    build_bank(SETTINGS, 1500, other, workers=2, seed=11)
+    with open(bank_path, "rb") as a, open(other, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_rejects_numbers_that_do_not_fit(tmp_path):
+    settings = copy.deepcopy(SETTINGS)
+    settings["difficulty"]["advanced"]["max"] = 40000
+    with pytest.raises(ValueError):
+        build_bank(settings, 100, str(tmp_path / "bank.bin"), workers=1)
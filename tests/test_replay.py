@@ -0,0 +1,99 @@
+import copy
+import os
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import pytest
+
+import calcraze
+import replay
+from language_pack import StringTable
+from session_log import SessionClock, load_session
+
+
+@pytest.fixture
+def game_env(tmp_path, monkeypatch):
+    # 字体、素材按相对路径读取；分数库和题库换成临时路径，不动 config/ 里的文件
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    monkeypatch.setattr(calcraze, "SCORES", None)
+    monkeypatch.setattr(calcraze, "SCORES_DB_FILE", str(tmp_path / "scores.db"))
+    monkeypatch.setattr(calcraze, "HIGH_SCORE_FILE", str(tmp_path / "highscore.dat"))
+    monkeypatch.setattr(calcraze, "PUZZLE_BANK_FILE", str(tmp_path / "puzzle_bank.bin"))
+    # 不调用 pygame.quit：字体注册表缓存的字体对象在 quit 之后不能再用
+    pygame.init()
+    return tmp_path
+
+
+def record(tmp_path, seed, difficulty="beginner", steps=400):
+    """用假时钟和随机输入打一局，返回录像文件路径。"""
+    settings = copy.deepcopy(calcraze.DEFAULT_SETTINGS)
+    settings.update(record_sessions=True, current_difficulty=difficulty)
+    screen = pygame.display.set_mode((settings["window_width"], settings["window_height"]))
+    now = [0.0]
+    clock = SessionClock(base=lambda: now[0])
+    ld = StringTable("en", calcraze.DEFAULT_LANGUAGES["en"])
+    game = calcraze.FormulaFillGame(screen, settings, ld, "en", seed=seed, clock=clock, interactive=False)
+    rng = random.Random(seed)
+    cells = settings["grid_size"] ** 2
+    for _ in range(steps):
+        now[0] += rng.random() * 4
+        game.update_timer()
+        if not game.running:
+            break
+        a = rng.random()
+        if game.state.paused:
+            # 暂停一段时间后总会继续，后面的输入才有效
+            game.toggle_pause()
+        elif a < 0.55:
+            game.handle_click_cell(rng.randrange(cells))
+        elif a < 0.7:
+            game.evaluate_formula()
+        elif a < 0.8:
+            game.undo()
+        elif a < 0.83:
+            game.toggle_pause()
+        elif a < 0.85:
+            game.reset_game()
+    game.recorder.finish(game.state)
+    return game.recorder.save(str(tmp_path / f"session-{seed}.json")), game.state.score
+
+
+@pytest.mark.parametrize("seed,difficulty", [(1, "beginner"), (2, "intermediate"), (3, "advanced")])
+def test_replay_matches_recording(game_env, seed, difficulty):
+    path, score = record(game_env, seed, difficulty)
+    data = load_session(path)
+    assert data["events"]
+    ok, stats = replay.replay_session(data, draw=False)
+    assert ok
+    assert stats["score"] == score == data["result"]["score"]
+    # 带渲染再放一次，结果相同
+    ok, stats = replay.replay_session(data, draw=True)
+    assert ok and stats["frames"] == len(data["events"])
+
+
+def test_replay_detects_wrong_seed(game_env):
+    path, _ = record(game_env, 4)
+    data = load_session(path)
+    data["seed"] += 1
+    ok, _ = replay.replay_session(data, draw=False)
+    assert not ok
+
+
+def test_first_round_starts_at_zero(game_env):
+    # 时钟在建对局期间一直在走：第一回合仍然从 0 开始，和回放时一致
+    settings = copy.deepcopy(calcraze.DEFAULT_SETTINGS)
+    settings.update(record_sessions=True)
+    screen = pygame.display.set_mode((settings["window_width"], settings["window_height"]))
+    now = [5.0]
+
+    def base():
+        now[0] += 0.003
+        return now[0]
+
+    clock = SessionClock(base=base)
+    ld = StringTable("en", calcraze.DEFAULT_LANGUAGES["en"])
+    game = calcraze.FormulaFillGame(screen, settings, ld, "en", seed=9, clock=clock, interactive=False)
+    assert game.state.start_time == 0
@@ -0,0 +1,75 @@
+import random
+from itertools import permutations
+
+import pytest
+
+from formula_parser import PLACEHOLDERS, SKELETONS, evaluate_skeleton
+from solver import count_solutions, first_solution, solve
+
+# 除内置骨架外，再加几个最后一个占位符出现在分母里、或与前缀相乘的骨架，
+# 覆盖最后一格解分式线性方程的各种情形（系数为零、任意 x、非整数解）
+EXTRA_SKELETONS = [
+    ["A", "/", "(", "B", "-", "C", ")"],
+    ["A", "*", "B", "*", "C"],
+    ["(", "A", "+", "B", ")", "/", "(", "C", "-", "D", ")"],
+    ["A", "+", "B", "*", "C"],
+    ["A", "/", "B"]
+]
+
+
+def brute_force(grid, skeleton, target):
+    cells = [(r, c) for r in range(len(grid)) for c in range(len(grid[r]))]
+    k = sum(1 for s in skeleton if s in PLACEHOLDERS)
+    found = []
+    for sel in permutations(cells, k):
+        val = evaluate_skeleton(skeleton, [grid[r][c] for r, c in sel], exact=True)
+        if val is not None and val == target:
+            found.append(sel)
+    return found
+
+
+def random_case(rng):
+    size = rng.choice((2, 3))
+    lo = rng.choice((-3, 0, 1))
+    # 数字范围小，棋盘上经常有重复数字和 0
+    grid = [[rng.randint(lo, lo + 5) for _ in range(size)] for _ in range(size)]
+    skeleton = rng.choice(SKELETONS + EXTRA_SKELETONS)
+    k = sum(1 for s in skeleton if s in PLACEHOLDERS)
+    cells = [n for row in grid for n in row]
+    if k > len(cells):
+        skeleton = SKELETONS[0]
+        k = 2
+    if rng.random() < 0.7:
+        # 多数情况下目标值取某个真实组合的结果，保证有解
+        target = evaluate_skeleton(skeleton, rng.sample(cells, k), exact=True)
+        if target is None or type(target) is not int:
+            target = rng.randint(-10, 10)
+    else:
+        target = rng.randint(-10, 10)
+    return grid, skeleton, target
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_brute_force(seed):
+    grid, skeleton, target = random_case(random.Random(seed))
+    expected = brute_force(grid, skeleton, target)
+    got = solve(grid, skeleton, target)
+    assert sorted(got) == sorted(expected)
+    assert len(got) == len(set(got))
+    assert count_solutions(grid, skeleton, target) == len(expected)
+    first = first_solution(grid, skeleton, target)
+    if expected:
+        assert first in expected
+    else:
+        assert first is None
+
+
+def test_any_last_value():
+    # B 选到 0 时 A + 0 * C 与 C 无关：最后一格可以是任意剩下的格子
+    grid = [[0, 3], [2, 5]]
+    skeleton = ["A", "+", "B", "*", "C"]
+    for target in range(-2, 20):
+        expected = brute_force(grid, skeleton, target)
+        assert sorted(solve(grid, skeleton, target)) == sorted(expected)
+        assert count_solutions(grid, skeleton, target) == len(expected)
+    assert count_solutions(grid, skeleton, 3) >= 2
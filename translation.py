@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+# ------------------- 自动翻译 -------------------
+# 语言包缺的文字不再在主线程里逐条联网翻译：
+# 1. 翻译记忆库（磁盘上的 JSON）先查，命中的直接用；
+# 2. 没命中的先显示英文原文，整批交给后台线程翻译，结果写回记忆库并补到界面用的字典里；
+# 3. 翻译后端可替换，离线或测试时用 StubBackend。
+
+MAX_BATCH = 50
+
+
+class GoogleBackend:
+    """googletrans 只在第一次真正需要翻译时才导入，一个 Translator 反复使用。"""
+
+    def __init__(self):
+        self._translator = None
+
+    def translate(self, texts, dest, src="en"):
+        if self._translator is None:
+            from googletrans import Translator
+            self._translator = Translator()
+        out = []
+        for i in range(0, len(texts), MAX_BATCH):
+            results = self._translator.translate(texts[i:i + MAX_BATCH], dest=dest, src=src)
+            out.extend(r.text for r in results)
+        return out
+
+
+class StubBackend:
+    """不联网的本地后端：原样返回，marker 为真时加上 [语言] 前缀，便于测试时辨认。"""
+
+    def __init__(self, marker=False):
+        self.marker = marker
+        self.calls = 0
+
+    def translate(self, texts, dest, src="en"):
+        self.calls += 1
+        if self.marker:
+            return [f"[{dest}] {t}" for t in texts]
+        return list(texts)
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "stub": StubBackend
+}
+
+
+def make_backend(name):
+    cls = BACKENDS.get(name)
+    if cls is None:
+        logging.warning(f"Unknown translation backend {name!r}, using google")
+        cls = GoogleBackend
+    return cls()
+
+
+class TranslationMemory:
+    """按 {语言: {英文原文: 译文}} 存在磁盘上的翻译记忆库。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Failed to read translation memory {path}: {e}")
+
+    def get(self, lang, text):
+        return self._data.get(lang, {}).get(text)
+
+    def put_many(self, lang, pairs):
+        with self._lock:
+            self._data.setdefault(lang, {}).update(pairs)
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._data, ensure_ascii=False, indent=4)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+
+class AutoTranslator:
+    def __init__(self, memory, backend, on_update=None):
+        self.memory = memory
+        self.backend = backend
+        self.on_update = on_update
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # id(目标字典) -> (目标字典, 语言, {键: 英文原文})
+        self._watchers = {}
+        self._worker = None
+
+    def lookup(self, lang, source):
+        """source 是字符串或字符串列表；全部有译文时返回译文，否则返回 None。"""
+        if isinstance(source, list):
+            out = [self.memory.get(lang, line) for line in source]
+            return None if any(t is None for t in out) else out
+        return self.memory.get(lang, source)
+
+    def fill(self, target, lang, sources):
+        """
+        把 sources（键 -> 英文原文）补进 target：记忆库里有的直接用译文，没有的先放英文，
+        并在后台翻译，译文回来后再写进 target。返回仍在等待翻译的键。
+        同一个 target 再次调用时，之前未完成的请求不再写回它（例如中途又换了语言）。
+        """
+        pending = {}
+        texts = []
+        for key, source in sources.items():
+            tr = self.lookup(lang, source)
+            if tr is not None:
+                target[key] = tr
+                continue
+            target[key] = source
+            pending[key] = source
+            for line in (source if isinstance(source, list) else [source]):
+                if self.memory.get(lang, line) is None:
+                    texts.append(line)
+        with self._lock:
+            if pending:
+                self._watchers[id(target)] = (target, lang, pending)
+            else:
+                self._watchers.pop(id(target), None)
+        if texts:
+            self._queue.put((lang, texts))
+            self._ensure_worker()
+        return list(pending)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="auto-translate", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                lang, texts = self._queue.get(timeout=1)
+            except queue.Empty:
+                return
+            # 把排队中的同语言请求合并成一批
+            batches = {lang: list(texts)}
+            while True:
+                try:
+                    lang, texts = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batches.setdefault(lang, []).extend(texts)
+            for lang, texts in batches.items():
+                self._translate(lang, texts)
+
+    def _translate(self, lang, texts):
+        todo = [t for t in dict.fromkeys(texts) if self.memory.get(lang, t) is None]
+        if todo:
+            try:
+                results = self.backend.translate(todo, lang)
+            except Exception as e:
+                # 离线或服务出错时保持英文，下次启动再试
+                logging.warning(f"Auto-translation to {lang} failed: {e}")
+                return
+            self.memory.put_many(lang, dict(zip(todo, results)))
+            try:
+                self.memory.save()
+            except OSError as e:
+                logging.warning(f"Failed to save translation memory: {e}")
+        self._apply(lang)
+
+    def _apply(self, lang):
+        changed = False
+        with self._lock:
+            for tid, (target, wlang, pending) in list(self._watchers.items()):
+                if wlang != lang:
+                    continue
+                for key, source in list(pending.items()):
+                    tr = self.lookup(lang, source)
+                    if tr is not None:
+                        target[key] = tr
+                        del pending[key]
+                        changed = True
+                if not pending:
+                    del self._watchers[tid]
+        if changed and self.on_update:
+            self.on_update(lang)
+
+    def wait_idle(self, timeout=None):
+        """等后台翻译线程处理完当前队列（测试和退出时用）。"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
@@ -0,0 +1,400 @@
+import sys
+
+import pygame
+
+from assets import ASSETS_READY
+from colors import BLACK, WHITE, BLUE, DARK_GRAY, BG_COLOR
+from frame_profiler import PROFILER, STARTUP
+from frame_scheduler import FrameScheduler
+from render_cache import render_text
+
+# ------------------- 菜单控件 -------------------
+# 保留模式的菜单控件：每个界面把不变的部分（背景、标题、弹窗外框）画一次存成 Surface，
+# 选项的普通/选中两种样子也各渲染一次。之后换选中项只重画前后两项，
+# 用 display.update 把这两块推上屏幕；只有窗口需要重画时才整屏重画。
+# 弹窗打开时把当前画面截一张、压暗一次，之后一直拿它当背景。
+
+SELECT_MARKER = " ->"
+POPUP_DIM = (0, 0, 0, 120)
+
+# 界面文字变了（后台翻译补齐了缺的键）时发出；run_widget 收到后让控件按新文字重画，
+# 所以控件的标题、选项这些文字都可以传函数，重画时重新取值
+TRANSLATIONS_READY = pygame.event.custom_type()
+
+
+def _text(value):
+    return value() if callable(value) else value
+
+
+class ListView:
+    """竖排的一列选项，坐标相对于所在 Surface 的 origin。"""
+
+    def __init__(self, font, labels, origin, gap, bg, color=BLACK, selected_color=BLUE):
+        self.font = font
+        self.labels = list(labels)
+        self.x, self.y = origin
+        self.gap = gap
+        self.bg = bg
+        self.color = color
+        self.selected_color = selected_color
+        self.selected = 0
+        self._rects = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def set_labels(self, labels):
+        self.labels = list(labels)
+        self._rects = {}
+
+    def item_surface(self, i, selected):
+        if selected:
+            return render_text(self.font, self.labels[i] + SELECT_MARKER, True, self.selected_color)
+        return render_text(self.font, self.labels[i], True, self.color)
+
+    def item_rect(self, i):
+        # 选中时带箭头更宽，取两种样子的外接矩形，重画时能盖住上一种
+        r = self._rects.get(i)
+        if r is None:
+            w = max(self.item_surface(i, False).get_width(), self.item_surface(i, True).get_width())
+            h = max(self.item_surface(i, False).get_height(), self.item_surface(i, True).get_height())
+            r = self._rects[i] = pygame.Rect(self.x, self.y + i * self.gap, w, h)
+        return r
+
+    def draw_item(self, surface, i, dy=0):
+        r = self.item_rect(i).move(0, dy)
+        surface.fill(self.bg, r)
+        surface.blit(self.item_surface(i, i == self.selected), r.topleft)
+        return r
+
+    def draw(self, surface, dy=0):
+        for i in range(len(self.labels)):
+            self.draw_item(surface, i, dy)
+
+    def select(self, i):
+        """返回状态变了的选项下标。"""
+        i %= len(self.labels)
+        if i == self.selected:
+            return []
+        old, self.selected = self.selected, i
+        return [old, i]
+
+    def move(self, delta):
+        return self.select(self.selected + delta)
+
+
+class Widget:
+    """
+    控件的公共部分。子类实现 draw(screen) 整屏重画、handle(event) 处理输入；
+    需要局部重画时调用 invalidate(rect_fn)，rect_fn(screen) 画好这一块并返回它的矩形。
+    """
+
+    def __init__(self):
+        self.done = False
+        self.result = None
+        self._full = True
+        self._partial = []
+
+    def invalidate(self, part=None):
+        if part is None:
+            self._full = True
+        else:
+            self._partial.append(part)
+
+    def relabel(self):
+        """重新取界面文字并整屏重画。"""
+        self.invalidate()
+
+    def finish(self, result=None):
+        self.done = True
+        self.result = result
+
+    def animating(self):
+        return False
+
+    def render(self, screen):
+        """画出需要重画的部分，返回 None 表示整屏已重画，否则返回要更新的矩形列表。"""
+        if self._full:
+            self._full = False
+            self._partial = []
+            self.draw(screen)
+            return None
+        rects = [part(screen) for part in self._partial]
+        self._partial = []
+        return rects
+
+    def needs_render(self):
+        return self._full or bool(self._partial) or self.animating()
+
+
+def run_widget(screen, widget, fps=60):
+    """事件驱动地运行一个控件，直到它 finish，返回它的结果。"""
+    scheduler = FrameScheduler(fps)
+    while not widget.done:
+        if widget.needs_render():
+            with PROFILER.phase("draw"):
+                rects = widget.render(screen)
+            with PROFILER.phase("flip"):
+                if rects is None:
+                    pygame.display.flip()
+                    STARTUP.frame_shown()
+                elif rects:
+                    pygame.display.update(rects)
+        PROFILER.end_frame()
+        events = scheduler.wait(widget.animating())
+        PROFILER.begin_frame("menu")
+        with PROFILER.phase("event"):
+            for e in events:
+                if e.type == pygame.QUIT:
+                    pygame.quit(); sys.exit()
+                elif e.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    widget.invalidate()
+                elif e.type == TRANSLATIONS_READY:
+                    widget.relabel()
+                else:
+                    widget.handle(e)
+                if widget.done:
+                    break
+    return widget.result
+
+
+# ------------------- 全屏垂直选单 -------------------
+class VerticalMenu(Widget):
+    """
+    顶栏（含 Logo）、标题和选项。标题和选项先画进一张内容 Surface，
+    切换选项时的滑动动画每帧只把这张 Surface 按偏移 blit 一次。
+    """
+
+    def __init__(self, screen, bar_height, logo, font, title, items, tweens,
+                 scroll=15, scroll_duration=0.2):
+        super().__init__()
+        self.bar_height = bar_height
+        # logo 也可以是函数：Logo 还在后台加载时返回 None，收到 ASSETS_READY 后重画
+        self.logo = logo
+        self.font = font
+        self.title = title
+        self.items = items
+        self.tweens = tweens
+        self.scroll = scroll
+        self.scroll_duration = scroll_duration
+        self.scroll_from = 0
+        w, h = screen.get_size()
+        self.width = w
+        self.content_rect = pygame.Rect(0, bar_height, w, h - bar_height)
+        self.list = ListView(font, _text(items), (w // 2 - 100, 120), 50, BG_COLOR)
+        self.content = None
+        self.drawn_offset = None
+
+    def build_content(self):
+        self.content = pygame.Surface(self.content_rect.size)
+        self.content.fill(BG_COLOR)
+        t_surf = render_text(self.font, _text(self.title), True, BLACK)
+        self.content.blit(t_surf, t_surf.get_rect(center=(self.width // 2, 50)))
+        self.list.draw(self.content)
+
+    def relabel(self):
+        self.list.set_labels(_text(self.items))
+        self.content = None
+        self.invalidate()
+
+    def offset(self):
+        p = self.tweens.progress("scroll")
+        return 0 if p is None else int(self.scroll_from * (1 - p) ** 2)
+
+    def animating(self):
+        return self.tweens.progress("scroll") is not None
+
+    def draw_bar(self, screen):
+        pygame.draw.rect(screen, DARK_GRAY, (0, 0, self.width, self.bar_height))
+        logo = self.logo() if callable(self.logo) else self.logo
+        if logo:
+            screen.blit(logo, logo.get_rect(center=(self.width // 2, self.bar_height // 2)))
+
+    def draw_content(self, screen):
+        self.drawn_offset = self.offset()
+        screen.fill(BG_COLOR, self.content_rect)
+        screen.set_clip(self.content_rect)
+        screen.blit(self.content, (0, self.bar_height + self.drawn_offset))
+        screen.set_clip(None)
+        return self.content_rect
+
+    def draw(self, screen):
+        if self.content is None:
+            self.build_content()
+        self.draw_bar(screen)
+        self.draw_content(screen)
+
+    def needs_render(self):
+        # 动画结束后还要再画一次，把内容放回原位
+        return super().needs_render() or self.offset() != self.drawn_offset
+
+    def render(self, screen):
+        rects = super().render(screen)
+        if rects is not None and self.offset() != self.drawn_offset:
+            rects.append(self.draw_content(screen))
+        return rects
+
+    def select(self, delta):
+        # 内容 Surface 里只重画选中状态变了的两项
+        changed = self.list.move(delta)
+        if self.content is not None:
+            for i in changed:
+                self.list.draw_item(self.content, i)
+        if changed:
+            self.scroll_from = -self.scroll if delta > 0 else self.scroll
+            self.tweens.start("scroll", self.scroll_duration)
+            self.invalidate(self.draw_content)
+
+    def handle(self, e):
+        if e.type == ASSETS_READY:
+            self.invalidate(self.draw_logo_bar)
+        elif e.type == pygame.KEYDOWN:
+            if e.key == pygame.K_ESCAPE:
+                self.finish(None)
+            elif e.key == pygame.K_UP:
+                self.select(-1)
+            elif e.key == pygame.K_DOWN:
+                self.select(1)
+            elif e.key == pygame.K_RETURN:
+                self.finish(self.list.selected)
+
+    def draw_logo_bar(self, screen):
+        self.draw_bar(screen)
+        return pygame.Rect(0, 0, self.width, self.bar_height)
+
+
+# ------------------- 弹窗选单 -------------------
+class PopupMenu(Widget):
+    """
+    居中的弹窗。打开时截下当前画面并压暗一次，连同弹窗外框和标题合成一张底图；
+    之后整屏重画只是一次 blit 加各选项，换选中项只重画两项。
+    结果是选中项的下标，按 ESC 或点弹窗外面时为 None。
+    """
+
+    def __init__(self, screen, font, title, labels, width=300, bar_height=40, gap=40):
+        super().__init__()
+        self.font = font
+        self.title = title
+        self.labels = labels
+        self.bar_height = bar_height
+        self.gap = gap
+        self.list = ListView(font, _text(labels), (0, 0), gap, WHITE)
+        h = 200 + len(self.list) * gap
+        self.rect = pygame.Rect(0, 0, width, h)
+        self.rect.center = (screen.get_width() // 2, screen.get_height() // 2)
+        self.list.x, self.list.y = self.rect.x + 20, self.rect.y + bar_height
+        # 压暗的画面只截一次，换文字时在它上面重新合成底图
+        self.backdrop = screen.copy()
+        dim = pygame.Surface(self.backdrop.get_size(), pygame.SRCALPHA)
+        dim.fill(POPUP_DIM)
+        self.backdrop.blit(dim, (0, 0))
+        self.base = self.build_base()
+
+    def build_base(self):
+        base = self.backdrop.copy()
+        base.fill(WHITE, self.rect)
+        pygame.draw.rect(base, BLACK, self.rect, 2)
+        base.blit(render_text(self.font, _text(self.title), True, BLACK), (self.rect.x + 10, self.rect.y + 10))
+        return base
+
+    def relabel(self):
+        self.list.set_labels(_text(self.labels))
+        self.base = self.build_base()
+        self.invalidate()
+
+    def draw(self, screen):
+        screen.blit(self.base, (0, 0))
+        self.list.draw(screen)
+
+    def redraw_items(self, changed):
+        for i in changed:
+            self.invalidate(lambda screen, i=i: self.list.draw_item(screen, i))
+
+    def handle(self, e):
+        if e.type == pygame.KEYDOWN:
+            if e.key == pygame.K_ESCAPE:
+                self.finish(None)
+            elif e.key == pygame.K_UP:
+                self.redraw_items(self.list.move(-1))
+            elif e.key == pygame.K_DOWN:
+                self.redraw_items(self.list.move(1))
+            elif e.key == pygame.K_RETURN:
+                self.finish(self.list.selected)
+        elif e.type == pygame.MOUSEBUTTONDOWN:
+            if not self.rect.collidepoint(e.pos):
+                self.finish(None)
+            elif e.pos[1] - self.rect.y > self.bar_height:
+                i = (e.pos[1] - self.rect.y - self.bar_height) // self.gap
+                if 0 <= i < len(self.list):
+                    self.finish(i)
+
+
+# ------------------- 可滚动文字 -------------------
+class ScrollView(Widget):
+    """
+    帮助这类长文字：所有行只渲染一次，画进一张与内容等高的 Surface，
+    滚动时只把可见部分 blit 到视口并更新视口这一块。
+    """
+
+    def __init__(self, screen, font, lines, footer, top=150, line_height=40, step=20):
+        super().__init__()
+        w, h = screen.get_size()
+        self.size = (w, h)
+        self.font = font
+        self.lines = lines
+        self.footer_text = footer
+        self.top = top
+        self.line_height = line_height
+        self.viewport = pygame.Rect(0, 0, w, h - 60)
+        self.step = step
+        self.scroll = 0
+        self.footer_pos = (50, h - 50)
+        self.build()
+
+    def build(self):
+        w, h = self.size
+        lines = _text(self.lines)
+        self.content = pygame.Surface((w, max(h, self.top + len(lines) * self.line_height)))
+        self.content.fill(BG_COLOR)
+        y = self.top
+        for line in lines:
+            self.content.blit(render_text(self.font, line, True, BLACK), (50, y))
+            y += self.line_height
+        # 与原来一样，内容高度按每行 40 再加 200 估算，最后一行可以滚到视口里
+        self.max_scroll = max(0, len(lines) * self.line_height + 200 - h)
+        self.scroll = min(self.scroll, self.max_scroll)
+        self.footer = render_text(self.font, _text(self.footer_text), True, BLACK)
+
+    def relabel(self):
+        self.build()
+        self.invalidate()
+
+    def draw_viewport(self, screen):
+        screen.fill(BG_COLOR, self.viewport)
+        screen.blit(self.content, self.viewport.topleft, self.viewport.move(0, self.scroll))
+        return self.viewport
+
+    def draw(self, screen):
+        screen.fill(BG_COLOR)
+        self.draw_viewport(screen)
+        screen.blit(self.footer, self.footer_pos)
+
+    def scroll_by(self, dy):
+        scroll = min(self.max_scroll, max(0, self.scroll + dy))
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.invalidate(self.draw_viewport)
+
+    def handle(self, e):
+        if e.type == pygame.MOUSEBUTTONDOWN:
+            if e.button == 4:
+                self.scroll_by(-self.step)
+            elif e.button == 5:
+                self.scroll_by(self.step)
+        elif e.type == pygame.KEYDOWN:
+            if e.key == pygame.K_ESCAPE:
+                self.finish(None)
+            elif e.key == pygame.K_UP:
+                self.scroll_by(-self.step)
+            elif e.key == pygame.K_DOWN:
+                self.scroll_by(self.step)